@@ -29,40 +29,43 @@ from __future__ import annotations
 # STANDARD LIBRARY IMPORTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+import io
 import os
 import sys
 import re
-import json
 import html
 import time
+import queue
 import shutil
+import atexit
 import asyncio
 import hashlib
 import logging
 import secrets
 import sqlite3
 import tempfile
+import threading
 import traceback
 from pathlib import Path
-from datetime import datetime, timedelta
+from array import array
+from datetime import date, datetime, timedelta
 from typing import (
     Dict, List, Any, Optional, Union, Tuple, 
-    Callable, TypeVar, Set, AsyncGenerator
+    Callable, TypeVar, Set, AsyncGenerator, AsyncIterator, Iterator, Deque
 )
-from dataclasses import dataclass, field
-from functools import wraps, lru_cache
-from collections import defaultdict
-from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields, asdict
+from functools import wraps, lru_cache, partial
+from collections import defaultdict, deque, OrderedDict
+from contextlib import asynccontextmanager, suppress
 from concurrent.futures import ThreadPoolExecutor
 import base64
-import uuid
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # THIRD-PARTY IMPORTS
 # ═══════════════════════════════════════════════════════════════════════════════
 
 try:
-    from pyrogram import Client, filters, enums
+    from pyrogram import Client, filters, enums, raw
     from pyrogram.types import (
         Message, CallbackQuery, InlineKeyboardMarkup, 
         InlineKeyboardButton, InputMediaVideo, InputMediaAudio
@@ -85,18 +88,38 @@ except ImportError:
 try:
     import aiohttp
     import aiofiles
+    import aiofiles.os
 except ImportError:
     print("❌ aiohttp/aiofiles not installed. Run: pip install aiohttp aiofiles")
     sys.exit(1)
 
 try:
-    from cryptography.fernet import Fernet
+    from cryptography.fernet import Fernet, InvalidToken
     from cryptography.hazmat.primitives import hashes
     from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 except ImportError:
     print("❌ cryptography not installed. Run: pip install cryptography")
     sys.exit(1)
 
+# Optional Rust-backed Fernet (same token format, much faster)
+try:
+    from rfernet import Fernet as RustFernet, DecryptionError
+except ImportError:
+    RustFernet = None
+    DecryptionError = InvalidToken
+
+# Optional SIMD non-cryptographic hash for cache keys
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Optional libuv-based event loop (not available on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 try:
     import aiosqlite
 except ImportError:
@@ -119,8 +142,9 @@ from config import (
 )
 
 from languages import (
-    get_text, t, get_user_language, set_user_language,
-    get_available_languages, is_rtl, load_all_languages
+    get_text, get_template, t, get_user_language, set_user_language,
+    get_available_languages, is_rtl, load_all_languages, load_user_languages,
+    add_reload_hook
 )
 
 from languages.utils import (
@@ -134,6 +158,10 @@ from languages.utils import (
 # LOGGING SETUP
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Background listener that drains queued records into the file handlers
+log_listener: Optional["logging.handlers.QueueListener"] = None
+
+
 def setup_logging(config: BotConfig) -> logging.Logger:
     """
     Configure and return the main logger with file and console handlers.
@@ -168,9 +196,11 @@ def setup_logging(config: BotConfig) -> logging.Logger:
         console_handler.setLevel(logging.DEBUG)
         logger.addHandler(console_handler)
     
-    # File handler with rotation
+    # File handlers with rotation, written from a background thread so
+    # disk I/O and rollovers never block the event loop
     if config.logging.log_to_file:
-        from logging.handlers import RotatingFileHandler
+        from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+        global log_listener
         
         file_handler = RotatingFileHandler(
             filename=log_dir / "bot.log",
@@ -191,7 +221,17 @@ def setup_logging(config: BotConfig) -> logging.Logger:
         )
         error_handler.setFormatter(formatter)
         error_handler.setLevel(logging.ERROR)
-        logger.addHandler(error_handler)
+        
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(log_queue))
+        
+        if log_listener is not None:
+            log_listener.stop()
+        log_listener = QueueListener(
+            log_queue, file_handler, error_handler,
+            respect_handler_level=True
+        )
+        log_listener.start()
     
     return logger
 
@@ -202,9 +242,9 @@ logger = setup_logging(config)
 
 # Log startup info
 logger.info("=" * 60)
-logger.info(f"🎬 Video Downloader Bot v{VERSION} ({CODENAME})")
-logger.info(f"📅 Build Date: {BUILD_DATE}")
-logger.info(f"🌐 Default Language: {DEFAULT_LANGUAGE}")
+logger.info("🎬 Video Downloader Bot v%s (%s)", VERSION, CODENAME)
+logger.info("📅 Build Date: %s", BUILD_DATE)
+logger.info("🌐 Default Language: %s", DEFAULT_LANGUAGE)
 logger.info("=" * 60)
 
 
@@ -215,13 +255,18 @@ logger.info("=" * 60)
 T = TypeVar('T')
 MessageHandler = Callable[[Client, Message], Any]
 CallbackHandler = Callable[[Client, CallbackQuery], Any]
+CallbackDataHandler = Callable[[Client, CallbackQuery, str, str], Any]
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # DATA CLASSES
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@dataclass
+# View count abbreviations, largest first
+VIEW_COUNT_UNITS: Tuple[Tuple[int, str], ...] = ((1_000_000, "M"), (1_000, "K"))
+
+
+@dataclass(frozen=True, slots=True)
 class VideoInfo:
     """Represents extracted video information."""
     url: str
@@ -241,6 +286,15 @@ class VideoInfo:
     extractor: str = ""
     webpage_url: str = ""
     
+    # HTML-escaped title and uploader, computed once for every message that shows them
+    title_html: str = field(init=False, repr=False, compare=False)
+    uploader_html: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Frozen dataclass, so the derived fields are set through object.__setattr__
+        object.__setattr__(self, "title_html", escape_html(truncate_text(self.title, 100)))
+        object.__setattr__(self, "uploader_html", escape_html(self.uploader or "N/A"))
+    
     @property
     def duration_formatted(self) -> str:
         """Get formatted duration string."""
@@ -249,16 +303,15 @@ class VideoInfo:
     @property
     def views_formatted(self) -> str:
         """Get formatted view count."""
-        if self.view_count:
-            if self.view_count >= 1_000_000:
-                return f"{self.view_count / 1_000_000:.1f}M"
-            elif self.view_count >= 1_000:
-                return f"{self.view_count / 1_000:.1f}K"
-            return str(self.view_count)
-        return "N/A"
+        if not self.view_count:
+            return "N/A"
+        for threshold, suffix in VIEW_COUNT_UNITS:
+            if self.view_count >= threshold:
+                return f"{self.view_count / threshold:.1f}{suffix}"
+        return str(self.view_count)
 
 
-@dataclass
+@dataclass(slots=True)
 class FormatInfo:
     """Represents a video/audio format option."""
     format_id: str
@@ -290,7 +343,21 @@ class FormatInfo:
         return format_file_size(self.filesize) if self.filesize else "Unknown"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class ExtractedInfo:
+    """
+    A yt-dlp info dict and who it was extracted for.
+    
+    Formats carry the extracting user's session (signed URLs, cookies and
+    headers), so the dict is only reused for the same user with the same
+    cookie set.
+    """
+    info: Dict[str, Any]
+    user_id: Optional[int]
+    cookie_key: str  # cookie_fingerprint() of the cookies used
+
+
+@dataclass(slots=True)
 class DownloadTask:
     """Represents an active download task."""
     task_id: str
@@ -299,6 +366,7 @@ class DownloadTask:
     message_id: int
     url: str
     video_info: Optional[VideoInfo] = None
+    extracted_info: Optional[ExtractedInfo] = field(default=None, repr=False)
     selected_format: Optional[FormatInfo] = None
     status: DownloadStatus = DownloadStatus.PENDING
     progress: float = 0.0
@@ -311,15 +379,26 @@ class DownloadTask:
     started_at: datetime = field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
     cancelled: bool = False
+    # Monotonic counterparts of started_at/completed_at for cheap elapsed math
+    started_monotonic: float = field(default_factory=time.monotonic, repr=False)
+    completed_monotonic: Optional[float] = field(default=None, repr=False)
     
     @property
     def elapsed_time(self) -> float:
         """Get elapsed time in seconds."""
-        end_time = self.completed_at or datetime.now()
-        return (end_time - self.started_at).total_seconds()
+        end_time = self.completed_monotonic
+        if end_time is None:
+            end_time = time.monotonic()
+        return end_time - self.started_monotonic
+    
+    def mark_finished(self) -> None:
+        """Stamp the end time once the task completes, fails or is cancelled."""
+        if self.completed_monotonic is None:
+            self.completed_at = datetime.now()
+            self.completed_monotonic = time.monotonic()
 
 
-@dataclass
+@dataclass(slots=True)
 class UserData:
     """Represents user data and preferences."""
     user_id: int
@@ -354,12 +433,61 @@ class UserData:
         if self.total_downloads == 0:
             return 0.0
         return (self.successful_downloads / self.total_downloads) * 100
+    
+    @property
+    def daily_downloads_today(self) -> int:
+        """Get today's download count (0 if the counter is from an earlier day)."""
+        if self.daily_reset.date() < date.today():
+            return 0
+        return self.daily_downloads
+    
+    def reset_daily_if_stale(self, now: datetime) -> None:
+        """Zero the daily counter if it was last reset on an earlier day."""
+        if self.daily_reset.date() < now.date():
+            self.daily_downloads = 0
+            self.daily_reset = now
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # GLOBAL STATE MANAGEMENT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a time-to-live.
+    Not locked: all access happens on the event loop thread.
+    """
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """Get value if present and not expired, marking it recently used."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        
+        value, timestamp = entry
+        if time.monotonic() - timestamp >= (self.ttl if ttl is None else ttl):
+            del self._data[key]
+            return None
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store value, evicting the least recently used entries if full."""
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
 class BotState:
     """
     Manages global bot state including active downloads, user data, and caches.
@@ -371,9 +499,9 @@ class BotState:
         self._downloads: Dict[str, DownloadTask] = {}
         self._user_downloads: Dict[int, Set[str]] = defaultdict(set)
         self._user_data: Dict[int, UserData] = {}
-        self._cache: Dict[str, Tuple[Any, float]] = {}
-        self._rate_limits: Dict[int, List[float]] = defaultdict(list)
-        self._start_time = datetime.now()
+        self._cache = TTLCache(max_size=config.cache.max_size, ttl=config.cache.ttl)
+        self._rate_limits: Dict[int, Deque[float]] = defaultdict(deque)
+        self._start_monotonic = time.monotonic()
         self._total_downloads = 0
         self._successful_downloads = 0
         self._failed_downloads = 0
@@ -381,27 +509,20 @@ class BotState:
     @property
     def uptime(self) -> timedelta:
         """Get bot uptime."""
-        return datetime.now() - self._start_time
+        return timedelta(seconds=time.monotonic() - self._start_monotonic)
     
     @property
     def uptime_formatted(self) -> str:
         """Get formatted uptime string."""
-        uptime = self.uptime
-        days = uptime.days
-        hours, remainder = divmod(uptime.seconds, 3600)
+        days, remainder = divmod(int(self.uptime.total_seconds()), 86400)
+        hours, remainder = divmod(remainder, 3600)
         minutes, seconds = divmod(remainder, 60)
         
-        parts = []
-        if days:
-            parts.append(f"{days}d")
-        if hours:
-            parts.append(f"{hours}h")
-        if minutes:
-            parts.append(f"{minutes}m")
-        if seconds or not parts:
-            parts.append(f"{seconds}s")
-        
-        return " ".join(parts)
+        return " ".join(
+            f"{value}{unit}"
+            for value, unit in ((days, "d"), (hours, "h"), (minutes, "m"), (seconds, "s"))
+            if value or (unit == "s" and not (days or hours or minutes))
+        )
     
     async def add_download(self, task: DownloadTask) -> None:
         """Add a new download task."""
@@ -409,23 +530,24 @@ class BotState:
             self._downloads[task.task_id] = task
             self._user_downloads[task.user_id].add(task.task_id)
     
-    async def get_download(self, task_id: str) -> Optional[DownloadTask]:
+    def get_download(self, task_id: str) -> Optional[DownloadTask]:
         """Get a download task by ID."""
         return self._downloads.get(task_id)
     
     async def remove_download(self, task_id: str) -> None:
-        """Remove a download task."""
+        """Remove a download task, stamping its end time."""
         async with self._lock:
             if task_id in self._downloads:
                 task = self._downloads[task_id]
+                task.mark_finished()
                 self._user_downloads[task.user_id].discard(task_id)
                 del self._downloads[task_id]
     
-    async def get_user_download_count(self, user_id: int) -> int:
+    def get_user_download_count(self, user_id: int) -> int:
         """Get number of active downloads for a user."""
         return len(self._user_downloads.get(user_id, set()))
     
-    async def get_user_downloads(self, user_id: int) -> List[DownloadTask]:
+    def get_user_downloads(self, user_id: int) -> List[DownloadTask]:
         """Get all active downloads for a user."""
         task_ids = self._user_downloads.get(user_id, set())
         return [self._downloads[tid] for tid in task_ids if tid in self._downloads]
@@ -445,45 +567,54 @@ class BotState:
         """Get total number of active downloads."""
         return len(self._downloads)
     
-    async def get_cached(self, key: str, ttl: int = 300) -> Optional[Any]:
-        """Get cached value if not expired."""
-        if key in self._cache:
-            value, timestamp = self._cache[key]
-            if time.time() - timestamp < ttl:
-                return value
-            del self._cache[key]
-        return None
+    def get_user_data(self, user_id: int) -> Optional[UserData]:
+        """Get in-memory user data (None if not loaded)."""
+        return self._user_data.get(user_id)
+    
+    def set_user_data(self, user_data: UserData) -> None:
+        """Store user data in memory."""
+        self._user_data[user_data.user_id] = user_data
+    
+    def load_user_data(self, users: List[UserData]) -> None:
+        """Bulk-load user data into memory (used to warm the cache on startup)."""
+        self._user_data.update((user.user_id, user) for user in users)
     
-    async def set_cached(self, key: str, value: Any) -> None:
+    def get_all_user_data(self) -> List[UserData]:
+        """Get all in-memory user data."""
+        return list(self._user_data.values())
+    
+    def get_cached(self, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """Get cached value if not expired (defaults to the cache TTL)."""
+        return self._cache.get(key, ttl)
+    
+    def set_cached(self, key: str, value: Any) -> None:
         """Set cached value with current timestamp."""
-        async with self._lock:
-            self._cache[key] = (value, time.time())
+        self._cache.set(key, value)
     
-    async def check_rate_limit(self, user_id: int, limit: int, window: int = 86400) -> Tuple[bool, int]:
+    def check_rate_limit(self, user_id: int, limit: int, window: int = 86400) -> Tuple[bool, int]:
         """
         Check if user has exceeded rate limit.
         
+        This is an in-process sliding window (one deque of timestamps per
+        user), so the check never leaves the event loop thread and costs
+        amortized O(1). Counts reset when the bot restarts.
+        
         Returns:
             Tuple of (is_allowed, remaining_count)
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         cutoff_time = current_time - window
+        timestamps = self._rate_limits[user_id]
         
-        async with self._lock:
-            # Clean old entries
-            self._rate_limits[user_id] = [
-                ts for ts in self._rate_limits[user_id] 
-                if ts > cutoff_time
-            ]
-            
-            current_count = len(self._rate_limits[user_id])
-            remaining = limit - current_count
-            
-            if current_count < limit:
-                self._rate_limits[user_id].append(current_time)
-                return True, remaining - 1
-            
-            return False, 0
+        # Drop expired entries from the head (no await, so this is atomic)
+        while timestamps and timestamps[0] <= cutoff_time:
+            timestamps.popleft()
+        
+        if len(timestamps) < limit:
+            timestamps.append(current_time)
+            return True, limit - len(timestamps)
+        
+        return False, 0
     
     async def increment_stats(self, success: bool = True) -> None:
         """Increment download statistics."""
@@ -520,16 +651,57 @@ bot_state = BotState()
 
 class DatabaseManager:
     """
-    Async database manager for SQLite with connection pooling.
+    Async database manager for SQLite backed by a single shared connection.
     Handles user data, download history, and statistics.
+    
+    aiosqlite already runs every connection on its own worker thread and
+    serializes statements through a queue, so one long-lived connection
+    (with WAL and a warm page cache) outperforms a pool of them.
+    """
+    
+    # Connection-level tuning applied once to every connection we open
+    PRAGMAS = f"""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+        PRAGMA busy_timeout={config.database.timeout * 1000};
+    """
+    
+    # Download history is buffered and written in batches
+    HISTORY_INSERT_SQL = """
+        INSERT INTO downloads 
+        (user_id, url, title, platform, quality, file_size, duration, status, error_message, completed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    HISTORY_BATCH_SIZE = 64
+    HISTORY_FLUSH_INTERVAL = 2.0
+    
+    # Insert-or-touch for an incoming user; RETURNING needs SQLite 3.35+
+    TOUCH_USER_SQL = """
+        INSERT INTO users (user_id, username, first_name, last_name, language, last_active)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            last_active = excluded.last_active
     """
+    SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+    
+    # Columns create_or_update_user may write: every UserData field but the key
+    USER_COLUMNS = frozenset(f.name for f in fields(UserData)) - {"user_id"}
     
     def __init__(self, db_path: Path):
         self.db_path = db_path
-        self._pool: List[aiosqlite.Connection] = []
-        self._pool_size = 5
-        self._lock = asyncio.Lock()
+        self._conn: Optional[aiosqlite.Connection] = None
         self._initialized = False
+        self._history_buffer: List[Tuple[Any, ...]] = []
+        self._history_lock = asyncio.Lock()
+        # Serializes transactions on the shared connection
+        self._write_lock = asyncio.Lock()
+        self._history_task: Optional[asyncio.Task] = None
     
     async def initialize(self) -> None:
         """Initialize database and create tables."""
@@ -539,6 +711,8 @@ class DatabaseManager:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
         async with aiosqlite.connect(self.db_path) as db:
+            # WAL first, so the schema work doesn't take a rollback-journal lock
+            await db.executescript(self.PRAGMAS)
             await db.executescript("""
                 -- Users table
                 CREATE TABLE IF NOT EXISTS users (
@@ -603,110 +777,314 @@ class DatabaseManager:
                     top_platform TEXT
                 );
                 
+                -- Aggregate user counters, kept current by the triggers below
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total INTEGER DEFAULT 0,
+                    vip INTEGER DEFAULT 0,
+                    banned INTEGER DEFAULT 0
+                );
+                
+                -- Seed from the existing rows on first run
+                INSERT OR IGNORE INTO user_stats (id, total, vip, banned)
+                SELECT 1, COUNT(*), IFNULL(SUM(is_vip IS 1), 0), IFNULL(SUM(is_banned IS 1), 0)
+                FROM users;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users
+                BEGIN
+                    UPDATE user_stats SET
+                        total = total + 1,
+                        vip = vip + (NEW.is_vip IS 1),
+                        banned = banned + (NEW.is_banned IS 1)
+                    WHERE id = 1;
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_users_stats_update
+                AFTER UPDATE OF is_vip, is_banned ON users
+                BEGIN
+                    UPDATE user_stats SET
+                        vip = vip + (NEW.is_vip IS 1) - (OLD.is_vip IS 1),
+                        banned = banned + (NEW.is_banned IS 1) - (OLD.is_banned IS 1)
+                    WHERE id = 1;
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+                BEGIN
+                    UPDATE user_stats SET
+                        total = total - 1,
+                        vip = vip - (OLD.is_vip IS 1),
+                        banned = banned - (OLD.is_banned IS 1)
+                    WHERE id = 1;
+                END;
+                
                 -- Create indexes
-                CREATE INDEX IF NOT EXISTS idx_downloads_user ON downloads(user_id);
                 CREATE INDEX IF NOT EXISTS idx_downloads_date ON downloads(created_at);
-                CREATE INDEX IF NOT EXISTS idx_cookies_user ON cookies(user_id);
-                CREATE INDEX IF NOT EXISTS idx_cookies_platform ON cookies(platform);
+                CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active);
+                CREATE INDEX IF NOT EXISTS idx_users_daily_reset ON users(daily_reset);
+                CREATE INDEX IF NOT EXISTS idx_downloads_user_date ON downloads(user_id, created_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_cookies_user_platform ON cookies(user_id, platform, is_valid);
+                
+                -- Drop single-column indexes covered by the composites above
+                DROP INDEX IF EXISTS idx_downloads_user;
+                DROP INDEX IF EXISTS idx_cookies_user;
+                DROP INDEX IF EXISTS idx_cookies_platform;
             """)
             await db.commit()
         
+        # Open the shared connection used by every query
+        self._conn = await aiosqlite.connect(self.db_path)
+        self._conn.row_factory = aiosqlite.Row
+        await self._conn.executescript(self.PRAGMAS)
+        
+        # Periodically flush buffered history rows
+        self._history_task = asyncio.create_task(self._history_flush_loop())
+    
         self._initialized = True
+        await self.warm_cache(bot_state)
         logger.info("✅ Database initialized successfully")
     
+    async def warm_cache(self, state: BotState) -> None:
+        """
+        Load every user row into memory.
+    
+        SQLite stays the durable store; reads are served from memory and
+        writes go through to both.
+    
+        Args:
+            state: Bot state that holds the in-memory user data
+        """
+        users = []
+        async with self._conn.execute("SELECT * FROM users") as cursor:
+            async for row in cursor:
+                users.append(self._row_to_user_data(row))
+    
+        state.load_user_data(users)
+        load_user_languages({user.user_id: user.language for user in users})
+        logger.info("📥 Loaded %d users into memory", len(users))
+    
     @asynccontextmanager
     async def get_connection(self) -> AsyncGenerator[aiosqlite.Connection, None]:
-        """Get a database connection from pool."""
-        async with self._lock:
-            if self._pool:
-                conn = self._pool.pop()
-            else:
-                conn = await aiosqlite.connect(self.db_path)
-                conn.row_factory = aiosqlite.Row
+        """Get the shared database connection."""
+        if self._conn is None:
+            await self.initialize()
+        yield self._conn
+    
+    @asynccontextmanager
+    async def write_transaction(
+        self, db: aiosqlite.Connection
+    ) -> AsyncGenerator[None, None]:
+        """
+        Run a block in its own write transaction, rolled back if it raises.
         
-        try:
-            yield conn
-        finally:
-            async with self._lock:
-                if len(self._pool) < self._pool_size:
-                    self._pool.append(conn)
-                else:
-                    await conn.close()
+        The connection is shared, so transactions are serialized: a second
+        writer waits for the first to commit or roll back rather than
+        running its statements inside it.
+        """
+        async with self._write_lock:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                await db.rollback()
+                raise
+            await db.commit()
+    
+    @staticmethod
+    def _row_to_user_data(row: aiosqlite.Row) -> UserData:
+        """Convert a users table row to UserData."""
+        return UserData(
+            user_id=row["user_id"],
+            username=row["username"] or "",
+            first_name=row["first_name"] or "",
+            last_name=row["last_name"] or "",
+            language=row["language"],
+            default_quality=row["default_quality"],
+            is_vip=bool(row["is_vip"]),
+            vip_expiry=datetime.fromisoformat(row["vip_expiry"]) if row["vip_expiry"] else None,
+            is_banned=bool(row["is_banned"]),
+            ban_reason=row["ban_reason"] or "",
+            total_downloads=row["total_downloads"],
+            successful_downloads=row["successful_downloads"],
+            failed_downloads=row["failed_downloads"],
+            total_size=row["total_size"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            last_active=datetime.fromisoformat(row["last_active"]),
+            daily_downloads=row["daily_downloads"],
+            daily_reset=datetime.fromisoformat(row["daily_reset"])
+        )
     
     async def get_user(self, user_id: int) -> Optional[UserData]:
-        """Get user data by ID."""
+        """Get user data by ID (served from memory, loaded from the DB on a miss)."""
+        user_data = bot_state.get_user_data(user_id)
+        if user_data:
+            return user_data
+        
         async with self.get_connection() as db:
             async with db.execute(
                 "SELECT * FROM users WHERE user_id = ?", (user_id,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return UserData(
-                        user_id=row["user_id"],
-                        username=row["username"] or "",
-                        first_name=row["first_name"] or "",
-                        last_name=row["last_name"] or "",
-                        language=row["language"],
-                        default_quality=row["default_quality"],
-                        is_vip=bool(row["is_vip"]),
-                        vip_expiry=datetime.fromisoformat(row["vip_expiry"]) if row["vip_expiry"] else None,
-                        is_banned=bool(row["is_banned"]),
-                        ban_reason=row["ban_reason"] or "",
-                        total_downloads=row["total_downloads"],
-                        successful_downloads=row["successful_downloads"],
-                        failed_downloads=row["failed_downloads"],
-                        total_size=row["total_size"],
-                        created_at=datetime.fromisoformat(row["created_at"]),
-                        last_active=datetime.fromisoformat(row["last_active"]),
-                        daily_downloads=row["daily_downloads"],
-                        daily_reset=datetime.fromisoformat(row["daily_reset"])
-                    )
+                    user_data = self._row_to_user_data(row)
+                    bot_state.set_user_data(user_data)
+                    return user_data
         return None
     
-    async def create_or_update_user(self, user_id: int, **kwargs) -> UserData:
-        """Create or update user data."""
-        existing = await self.get_user(user_id)
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _upsert_user_sql(columns: Tuple[str, ...]) -> str:
+        """Build (and cache) the UPSERT statement for a set of user columns."""
+        insert_columns = ("user_id",) + columns
+        placeholders = ", ".join("?" * len(insert_columns))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns)
+        return (
+            f"INSERT INTO users ({', '.join(insert_columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {updates}"
+        )
+    
+    async def create_or_update_user(
+        self,
+        user_id: int,
+        return_user: bool = True,
+        **kwargs
+    ) -> Optional[UserData]:
+        """
+        Create or update user data with a single UPSERT.
+        
+        Args:
+            user_id: Telegram user ID
+            return_user: Re-read and return the stored row
+            **kwargs: Column values to write
+            
+        Returns:
+            Updated UserData if return_user is True, otherwise None
+            
+        Raises:
+            ValueError: If a keyword is not a user column
+        """
+        unknown = kwargs.keys() - self.USER_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown user columns: {', '.join(sorted(unknown))}")
+        
+        kwargs.setdefault("last_active", datetime.now())
+        columns = tuple(sorted(kwargs))
+        values = [user_id]
+        for key in columns:
+            value = kwargs[key]
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
         
         async with self.get_connection() as db:
-            if existing:
-                # Update existing user
-                set_clauses = []
-                values = []
-                for key, value in kwargs.items():
-                    set_clauses.append(f"{key} = ?")
-                    if isinstance(value, datetime):
-                        values.append(value.isoformat())
-                    else:
-                        values.append(value)
-                
-                set_clauses.append("last_active = ?")
-                values.append(datetime.now().isoformat())
-                values.append(user_id)
-                
-                await db.execute(
-                    f"UPDATE users SET {', '.join(set_clauses)} WHERE user_id = ?",
-                    values
-                )
-            else:
-                # Create new user
-                columns = ["user_id"] + list(kwargs.keys())
-                placeholders = ["?"] * len(columns)
-                values = [user_id]
-                for value in kwargs.values():
-                    if isinstance(value, datetime):
-                        values.append(value.isoformat())
-                    else:
-                        values.append(value)
-                
-                await db.execute(
-                    f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join(placeholders)})",
-                    values
-                )
+            async with self.write_transaction(db):
+                await db.execute(self._upsert_user_sql(columns), values)
+    
+        # Write through to the in-memory copy
+        user_data = bot_state.get_user_data(user_id)
+        if user_data:
+            for key, value in kwargs.items():
+                setattr(user_data, key, value)
+    
+        if return_user:
+            return user_data or await self.get_user(user_id)
+        return None
+    
+    async def upsert_and_touch(
+        self,
+        user_id: int,
+        username: str,
+        first_name: str,
+        last_name: str
+    ) -> UserData:
+        """
+        Create the user or refresh their profile and last_active in one statement.
+        
+        Args:
+            user_id: Telegram user ID
+            username: Telegram username
+            first_name: First name
+            last_name: Last name
             
-            await db.commit()
+        Returns:
+            The stored UserData
+        """
+        now = datetime.now()
+        params = (user_id, username, first_name, last_name, DEFAULT_LANGUAGE, now.isoformat())
+        
+        async with self.get_connection() as db:
+            if self.SUPPORTS_RETURNING:
+                async with self.write_transaction(db):
+                    async with db.execute(self.TOUCH_USER_SQL + " RETURNING *", params) as cursor:
+                        row = await cursor.fetchone()
+                user_data = self._row_to_user_data(row)
+                bot_state.set_user_data(user_data)
+                return user_data
+            
+            async with self.write_transaction(db):
+                await db.execute(self.TOUCH_USER_SQL, params)
         
+        # Older SQLite: update the cached copy, or load the row
+        user_data = bot_state.get_user_data(user_id)
+        if user_data:
+            user_data.username = username
+            user_data.first_name = first_name
+            user_data.last_name = last_name
+            user_data.last_active = now
+            return user_data
         return await self.get_user(user_id)
     
+    @staticmethod
+    def _apply_download_count(user_id: int, success: bool, size: int) -> None:
+        """Mirror the counter UPDATE onto the in-memory user data."""
+        user_data = bot_state.get_user_data(user_id)
+        if not user_data:
+            return
+        now = datetime.now()
+        user_data.reset_daily_if_stale(now)
+        user_data.total_downloads += 1
+        user_data.daily_downloads += 1
+        user_data.last_active = now
+        if success:
+            user_data.successful_downloads += 1
+            user_data.total_size += size
+        else:
+            user_data.failed_downloads += 1
+    
+    @staticmethod
+    async def _execute_download_count(
+        db: aiosqlite.Connection,
+        user_id: int,
+        success: bool,
+        size: int,
+        timestamp: str
+    ) -> None:
+        """
+        Run the counter UPDATE for a finished download (no commit).
+        
+        A daily counter last reset before today (``timestamp``'s date) is
+        restarted here, so the midnight reset doesn't need to touch it.
+        """
+        today = timestamp[:10]
+        if success:
+            await db.execute("""
+                UPDATE users SET 
+                    total_downloads = total_downloads + 1,
+                    successful_downloads = successful_downloads + 1,
+                    total_size = total_size + ?,
+                    daily_downloads = CASE WHEN daily_reset < ? THEN 1 ELSE daily_downloads + 1 END,
+                    daily_reset = CASE WHEN daily_reset < ? THEN ? ELSE daily_reset END,
+                    last_active = ?
+                WHERE user_id = ?
+            """, (size, today, today, timestamp, timestamp, user_id))
+        else:
+            await db.execute("""
+                UPDATE users SET 
+                    total_downloads = total_downloads + 1,
+                    failed_downloads = failed_downloads + 1,
+                    daily_downloads = CASE WHEN daily_reset < ? THEN 1 ELSE daily_downloads + 1 END,
+                    daily_reset = CASE WHEN daily_reset < ? THEN ? ELSE daily_reset END,
+                    last_active = ?
+                WHERE user_id = ?
+            """, (today, today, timestamp, timestamp, user_id))
+    
     async def increment_download_count(
         self, 
         user_id: int, 
@@ -715,27 +1093,78 @@ class DatabaseManager:
     ) -> None:
         """Increment user's download count."""
         async with self.get_connection() as db:
-            if success:
-                await db.execute("""
-                    UPDATE users SET 
-                        total_downloads = total_downloads + 1,
-                        successful_downloads = successful_downloads + 1,
-                        total_size = total_size + ?,
-                        daily_downloads = daily_downloads + 1,
-                        last_active = ?
-                    WHERE user_id = ?
-                """, (size, datetime.now().isoformat(), user_id))
-            else:
-                await db.execute("""
-                    UPDATE users SET 
-                        total_downloads = total_downloads + 1,
-                        failed_downloads = failed_downloads + 1,
-                        daily_downloads = daily_downloads + 1,
-                        last_active = ?
-                    WHERE user_id = ?
-                """, (datetime.now().isoformat(), user_id))
+            async with self.write_transaction(db):
+                await self._execute_download_count(
+                    db, user_id, success, size, datetime.now().isoformat()
+                )
+        self._apply_download_count(user_id, success, size)
+    
+    async def record_download(
+        self,
+        user_id: int,
+        success: bool,
+        url: str,
+        title: str,
+        platform: str,
+        quality: str,
+        file_size: int,
+        duration: int,
+        error_message: str = ""
+    ) -> None:
+        """
+        Update the user's counters and add the history row in one transaction.
+        
+        Any buffered history rows are written in the same commit.
+        """
+        timestamp = datetime.now().isoformat()
+        status = "completed" if success else "failed"
+        
+        async with self._history_lock:
+            buffered, self._history_buffer = self._history_buffer, []
+            rows = buffered + [(
+                user_id, url, title, platform, quality, file_size,
+                duration, status, error_message, timestamp
+            )]
             
-            await db.commit()
+            try:
+                async with self.get_connection() as db:
+                    async with self.write_transaction(db):
+                        await self._execute_download_count(
+                            db, user_id, success, file_size, timestamp
+                        )
+                        await db.executemany(self.HISTORY_INSERT_SQL, rows)
+            except BaseException:
+                # Re-queue the buffered rows; this download's failure is re-raised
+                self._history_buffer[:0] = buffered
+                raise
+        self._apply_download_count(user_id, success, file_size)
+    
+    async def reset_daily_downloads(self) -> int:
+        """
+        Reset daily download counters last reset before today.
+        
+        Only stale rows are written (found through idx_users_daily_reset),
+        so running it twice, or late, is harmless. Counters are also reset
+        lazily when a user's next download is counted.
+        
+        The UPDATE runs in its own write transaction, and the in-memory
+        copies are only reset once it has committed.
+        
+        Returns:
+            Number of users reset
+        """
+        async with self.get_connection() as db:
+            async with self.write_transaction(db):
+                # Taken inside the transaction: waiting on the lock can cross midnight
+                now = datetime.now()
+                async with db.execute(
+                    "UPDATE users SET daily_downloads = 0, daily_reset = ? WHERE daily_reset < ?",
+                    (now.isoformat(), now.date().isoformat())
+                ) as cursor:
+                    reset_count = cursor.rowcount
+        for user_data in bot_state.get_all_user_data():
+            user_data.reset_daily_if_stale(now)
+        return reset_count
     
     async def add_download_history(
         self,
@@ -749,34 +1178,70 @@ class DatabaseManager:
         status: str,
         error_message: str = ""
     ) -> None:
-        """Add download to history."""
-        async with self.get_connection() as db:
-            await db.execute("""
-                INSERT INTO downloads 
-                (user_id, url, title, platform, quality, file_size, duration, status, error_message, completed_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+        """Queue a download for the history table (flushed in batches)."""
+        async with self._history_lock:
+            self._history_buffer.append((
                 user_id, url, title, platform, quality, file_size, 
                 duration, status, error_message, datetime.now().isoformat()
             ))
-            await db.commit()
+            should_flush = len(self._history_buffer) >= self.HISTORY_BATCH_SIZE
+        
+        if should_flush:
+            await self.flush_history()
+    
+    async def flush_history(self) -> None:
+        """Write all buffered history rows in a single transaction."""
+        async with self._history_lock:
+            if not self._history_buffer:
+                return
+            rows, self._history_buffer = self._history_buffer, []
+            
+            try:
+                async with self.get_connection() as db:
+                    async with self.write_transaction(db):
+                        await db.executemany(self.HISTORY_INSERT_SQL, rows)
+            except BaseException:
+                # Put the rows back (ahead of newer ones) for the next flush
+                self._history_buffer[:0] = rows
+                raise
+    
+    async def _history_flush_loop(self) -> None:
+        """Background loop that flushes the history buffer on a timer."""
+        while True:
+            try:
+                await asyncio.sleep(self.HISTORY_FLUSH_INTERVAL)
+                await self.flush_history()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"History flush error: {e}")
     
     async def get_download_history(
         self, 
         user_id: int, 
         limit: int = 50, 
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
-        """Get user's download history."""
+        offset: int = 0,
+        as_dict: bool = False
+    ) -> List[Union[aiosqlite.Row, Dict[str, Any]]]:
+        """
+        Get user's download history.
+        
+        Rows support access by column name, so they are returned as-is
+        unless as_dict is requested.
+        """
+        await self.flush_history()
         async with self.get_connection() as db:
             async with db.execute("""
-                SELECT * FROM downloads 
+                SELECT id, url, title, platform, quality, file_size, 
+                       duration, status, created_at 
+                FROM downloads 
                 WHERE user_id = ? 
                 ORDER BY created_at DESC 
                 LIMIT ? OFFSET ?
             """, (user_id, limit, offset)) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                if as_dict:
+                    return [dict(row) async for row in cursor]
+                return await cursor.fetchall()
     
     async def save_cookie(
         self, 
@@ -787,21 +1252,21 @@ class DatabaseManager:
     ) -> None:
         """Save encrypted cookie for user."""
         async with self.get_connection() as db:
-            # Remove existing cookie for this platform
-            await db.execute(
-                "DELETE FROM cookies WHERE user_id = ? AND platform = ?",
-                (user_id, platform)
-            )
-            
-            # Insert new cookie
-            await db.execute("""
-                INSERT INTO cookies (user_id, platform, cookie_data, expires_at)
-                VALUES (?, ?, ?, ?)
-            """, (
-                user_id, platform, cookie_data,
-                expires_at.isoformat() if expires_at else None
-            ))
-            await db.commit()
+            async with self.write_transaction(db):
+                # Remove existing cookie for this platform
+                await db.execute(
+                    "DELETE FROM cookies WHERE user_id = ? AND platform = ?",
+                    (user_id, platform)
+                )
+                
+                # Insert new cookie
+                await db.execute("""
+                    INSERT INTO cookies (user_id, platform, cookie_data, expires_at)
+                    VALUES (?, ?, ?, ?)
+                """, (
+                    user_id, platform, cookie_data,
+                    expires_at.isoformat() if expires_at else None
+                ))
     
     async def get_cookie(self, user_id: int, platform: str) -> Optional[str]:
         """Get cookie for user and platform."""
@@ -813,33 +1278,74 @@ class DatabaseManager:
                 row = await cursor.fetchone()
                 return row["cookie_data"] if row else None
     
-    async def get_all_cookies(self, user_id: int) -> List[Dict[str, Any]]:
-        """Get all cookies for user."""
+    async def get_all_cookies(
+        self,
+        user_id: int,
+        as_dict: bool = False
+    ) -> List[Union[aiosqlite.Row, Dict[str, Any]]]:
+        """
+        Get all cookies for user.
+        
+        Rows support access by column name, so they are returned as-is
+        unless as_dict is requested.
+        """
         async with self.get_connection() as db:
             async with db.execute("""
                 SELECT platform, created_at, expires_at, is_valid 
                 FROM cookies WHERE user_id = ?
             """, (user_id,)) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                if as_dict:
+                    return [dict(row) async for row in cursor]
+                return await cursor.fetchall()
     
     async def delete_cookie(self, user_id: int, platform: str) -> bool:
         """Delete cookie for user and platform."""
         async with self.get_connection() as db:
-            cursor = await db.execute(
-                "DELETE FROM cookies WHERE user_id = ? AND platform = ?",
-                (user_id, platform)
-            )
-            await db.commit()
+            async with self.write_transaction(db):
+                cursor = await db.execute(
+                    "DELETE FROM cookies WHERE user_id = ? AND platform = ?",
+                    (user_id, platform)
+                )
             return cursor.rowcount > 0
     
-    async def get_total_users(self) -> int:
-        """Get total number of users."""
+    async def migrate_cookie_tokens(self, encryption: "CookieEncryption") -> int:
+        """
+        One-shot rewrite of legacy double-base64 cookie rows.
+        
+        Args:
+            encryption: Encryption used to validate and unwrap tokens
+            
+        Returns:
+            Number of rows rewritten
+        """
+        async with self.get_connection() as db:
+            async with db.execute("SELECT id, cookie_data FROM cookies") as cursor:
+                updates = [
+                    (token, row["id"])
+                    async for row in cursor
+                    if (token := encryption.upgrade_legacy(row["cookie_data"] or ""))
+                ]
+            
+            if updates:
+                async with self.write_transaction(db):
+                    await db.executemany(
+                        "UPDATE cookies SET cookie_data = ? WHERE id = ?", updates
+                    )
+                logger.info("🔐 Migrated %d legacy cookie tokens", len(updates))
+        
+        return len(updates)
+    
+    async def _get_user_stat(self, column: str) -> int:
+        """Read one counter from the user_stats aggregate row."""
         async with self.get_connection() as db:
-            async with db.execute("SELECT COUNT(*) FROM users") as cursor:
+            async with db.execute(f"SELECT {column} FROM user_stats WHERE id = 1") as cursor:
                 row = await cursor.fetchone()
                 return row[0] if row else 0
     
+    async def get_total_users(self) -> int:
+        """Get total number of users."""
+        return await self._get_user_stat("total")
+    
     async def get_active_users(self, hours: int = 24) -> int:
         """Get number of active users in last N hours."""
         cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
@@ -852,37 +1358,58 @@ class DatabaseManager:
     
     async def get_vip_users(self) -> int:
         """Get number of VIP users."""
-        async with self.get_connection() as db:
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE is_vip = 1"
-            ) as cursor:
-                row = await cursor.fetchone()
-                return row[0] if row else 0
+        return await self._get_user_stat("vip")
     
     async def get_banned_users(self) -> int:
         """Get number of banned users."""
-        async with self.get_connection() as db:
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE is_banned = 1"
-            ) as cursor:
-                row = await cursor.fetchone()
-                return row[0] if row else 0
+        return await self._get_user_stat("banned")
     
-    async def get_all_user_ids(self) -> List[int]:
-        """Get all user IDs for broadcasting."""
-        async with self.get_connection() as db:
-            async with db.execute(
-                "SELECT user_id FROM users WHERE is_banned = 0"
-            ) as cursor:
-                rows = await cursor.fetchall()
-                return [row[0] for row in rows]
+    async def get_broadcast_user_count(self) -> int:
+        """Get number of users a broadcast goes to (everyone not banned)."""
+        return await self._get_user_stat("total - banned")
+    
+    async def iter_user_ids(self, batch_size: int = 1000) -> AsyncIterator[array]:
+        """
+        Yield non-banned user IDs in batches using keyset pagination.
+        
+        Each batch is a short indexed query on the primary key, so memory
+        stays at one batch and no read transaction is held between batches.
+        
+        Args:
+            batch_size: Maximum IDs per batch
+            
+        Yields:
+            Packed int64 arrays of user IDs in ascending order
+        """
+        last_id = -1
+        while True:
+            async with self.get_connection() as db:
+                async with db.execute(
+                    "SELECT user_id FROM users WHERE is_banned = 0 AND user_id > ? "
+                    "ORDER BY user_id LIMIT ?",
+                    (last_id, batch_size)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            
+            if not rows:
+                return
+            
+            # 8 bytes per ID instead of a list of int objects
+            batch = array('q', [row[0] for row in rows])
+            yield batch
+            last_id = batch[-1]
     
     async def close(self) -> None:
-        """Close all connections in pool."""
-        async with self._lock:
-            for conn in self._pool:
-                await conn.close()
-            self._pool.clear()
+        """Flush pending writes and close the shared connection."""
+        if self._history_task is not None:
+            self._history_task.cancel()
+            self._history_task = None
+        
+        if self._conn is not None:
+            await self.flush_history()
+            await self._conn.close()
+            self._conn = None
+        self._initialized = False
 
 
 # Initialize database
@@ -893,77 +1420,273 @@ db = DatabaseManager(DATABASE_DIR / "bot.db")
 # ENCRYPTION HELPERS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class CookieEncryption:
-    """
-    Handles secure encryption/decryption of cookies using Fernet (AES-128).
+@lru_cache(maxsize=4)
+def derive_encryption_key(password: bytes, salt: bytes, iterations: int) -> bytes:
     """
+    Derive a 32-byte key with PBKDF2-HMAC-SHA256.
     
-    def __init__(self, encryption_key: Optional[str] = None):
-        """
-        Initialize encryption with a key.
-        
-        Args:
-            encryption_key: Base64-encoded 32-byte key or None to generate
-        """
-        if encryption_key:
-            # Use provided key
-            key_bytes = base64.urlsafe_b64decode(encryption_key)
-        else:
-            # Generate a key from a password
-            password = secrets.token_bytes(32)
-            salt = secrets.token_bytes(16)
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
+    PBKDF2 is deliberately expensive, so results are cached and the
+    derivation only ever runs once per (password, salt, iterations).
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return kdf.derive(password)
+
+
+# Errors raised by either Fernet backend for a bad token or key
+FERNET_ERRORS = (InvalidToken, DecryptionError)
+
+
+def _build_fernet(key: bytes) -> Any:
+    """Build a Fernet instance, preferring the rfernet backend when installed."""
+    if RustFernet is not None:
+        return RustFernet(key.decode('ascii'))
+    return Fernet(key)
+
+
+def _encrypt_token(fernet: Any, data: Union[str, bytes, bytearray]) -> str:
+    """Encrypt a string or UTF-8 bytes and return the token as text (rfernet already does)."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    token = fernet.encrypt(bytes(data))
+    return token if isinstance(token, str) else token.decode('ascii')
+
+
+def _decrypt_token(fernet: Any, token: str) -> str:
+    """
+    Decrypt a Fernet token, accepting the legacy double-base64 format.
+    
+    Older versions wrapped the (already base64) token in a second
+    urlsafe-base64 layer; those rows are still readable.
+    """
+    try:
+        return fernet.decrypt(token).decode('utf-8')
+    except FERNET_ERRORS:
+        # A current-format token that fails is bad data or the wrong key
+        if token.startswith(CookieEncryption.TOKEN_PREFIX):
+            raise
+        return fernet.decrypt(base64.urlsafe_b64decode(token).decode('ascii')).decode('utf-8')
+
+
+def load_or_create_encryption_key(key_file: Path) -> str:
+    """
+    Load the persisted Fernet key, generating and saving one on first run.
+    
+    The file is written atomically with 0600 permissions so cookies stay
+    decryptable across restarts without an ENCRYPTION_KEY setting.
+    
+    Args:
+        key_file: Path of the key file
+        
+    Returns:
+        URL-safe base64-encoded 32-byte key
+    """
+    if key_file.exists():
+        return key_file.read_text().strip()
+    
+    key = Fernet.generate_key().decode('ascii')
+    key_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = key_file.with_name(f"{key_file.name}.{secrets.token_hex(4)}.tmp")
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        os.write(fd, key.encode('ascii'))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_file, key_file)
+    
+    logger.warning(f"🔑 Generated a new cookie encryption key at {key_file}")
+    return key
+
+
+class CookieEncryption:
+    """
+    Handles secure encryption/decryption of cookies using Fernet (AES-128).
+    The Fernet instance is built once and reused for every operation; the
+    Rust rfernet backend is used when installed.
+    """
+    
+    # Every Fernet token starts with the version byte 0x80 and a timestamp
+    TOKEN_PREFIX = "gAAAAA"
+    
+    def __init__(
+        self,
+        encryption_key: Optional[str] = None,
+        password: Optional[str] = None,
+        salt: str = "super-downloader-bot",
+        iterations: int = 100_000,
+        key_file: Optional[Path] = None
+    ):
+        """
+        Initialize encryption with a key.
+        
+        Args:
+            encryption_key: Base64-encoded 32-byte key
+            password: Password to derive the key from when no key is given
+            salt: Salt for password-based derivation
+            iterations: PBKDF2 iteration count
+            key_file: Persisted key used when neither key nor password is set
+        """
+        if encryption_key:
+            # Use provided key
+            key_bytes = base64.urlsafe_b64decode(encryption_key)
+        elif password:
+            # Derive a stable key from the configured password
+            key_bytes = derive_encryption_key(
+                password.encode('utf-8'), salt.encode('utf-8'), iterations
             )
-            key_bytes = kdf.derive(password)
+        elif key_file:
+            # Load (or create once) the persisted key
+            key_bytes = base64.urlsafe_b64decode(load_or_create_encryption_key(key_file))
+        else:
+            # Ephemeral key: cookies will not survive a restart
+            key_bytes = base64.urlsafe_b64decode(Fernet.generate_key())
         
-        self._fernet = Fernet(base64.urlsafe_b64encode(key_bytes[:32]))
+        self._fernet = _build_fernet(base64.urlsafe_b64encode(key_bytes[:32]))
     
-    def encrypt(self, data: str) -> str:
+    def encrypt(self, data: Union[str, bytes, bytearray]) -> str:
         """
         Encrypt a string.
         
         Args:
-            data: Plain text to encrypt
+            data: Plain text to encrypt, as str or UTF-8 bytes
             
         Returns:
-            Base64-encoded encrypted string
+            Fernet token (already URL-safe base64)
         """
-        encrypted = self._fernet.encrypt(data.encode('utf-8'))
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        return _encrypt_token(self._fernet, data)
     
     def decrypt(self, encrypted_data: str) -> str:
         """
         Decrypt an encrypted string.
         
         Args:
-            encrypted_data: Base64-encoded encrypted string
+            encrypted_data: Fernet token (legacy double-encoded tokens are accepted)
             
         Returns:
             Decrypted plain text
         """
-        encrypted_bytes = base64.urlsafe_b64decode(encrypted_data)
-        decrypted = self._fernet.decrypt(encrypted_bytes)
-        return decrypted.decode('utf-8')
+        return _decrypt_token(self._fernet, encrypted_data)
+    
+    def upgrade_legacy(self, encrypted_data: str) -> Optional[str]:
+        """
+        Re-encode a legacy double-base64 token as a plain Fernet token.
+        
+        Args:
+            encrypted_data: Stored encrypted string
+            
+        Returns:
+            The plain Fernet token, or None if no upgrade is needed/possible
+        """
+        if encrypted_data.startswith(self.TOKEN_PREFIX):
+            return None
+        try:
+            token = base64.urlsafe_b64decode(encrypted_data).decode('ascii')
+            # Validates the token against our key without keeping the plain text
+            self._fernet.decrypt(token)
+        except FERNET_ERRORS + (ValueError,):
+            return None
+        return token
 
 
 # Initialize encryption
-cookie_encryption = CookieEncryption(config.security.encryption_key)
+cookie_encryption = CookieEncryption(
+    encryption_key=config.security.encryption_key,
+    password=config.security.encryption_password,
+    salt=config.security.encryption_salt,
+    iterations=config.security.pbkdf2_iterations,
+    key_file=DATABASE_DIR / ".encryption_key"
+)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # PROGRESS TRACKER
 # ═══════════════════════════════════════════════════════════════════════════════
 
+@lru_cache(maxsize=64)
+def _progress_bar_cells(filled: int, length: int = 20) -> str:
+    """Build (and cache) the bar cells for a given number of filled cells."""
+    return generate_progress_bar(filled / length, length=length, show_percentage=False)
+
+
+# Formats (progress, downloaded_bytes, total_bytes, speed, eta, quality)
+ProgressFormatter = Callable[[float, int, int, float, int, str], str]
+
+# Translation key of the progress message for each status (others show "processing")
+_STATUS_TEMPLATE_KEYS: Dict[DownloadStatus, str] = {
+    DownloadStatus.DOWNLOADING: "download.progress",
+    DownloadStatus.MERGING: "download.merging",
+    DownloadStatus.UPLOADING: "download.uploading",
+}
+
+
+def _build_progress_formatter(lang_code: str, status: DownloadStatus) -> ProgressFormatter:
+    """
+    Build a progress formatter with the language and template resolved up front.
+    
+    Args:
+        lang_code: Language code for the message
+        status: Download status the message is for
+        
+    Returns:
+        Function that renders the progress message for the given values
+    """
+    template = get_text(_STATUS_TEMPLATE_KEYS.get(status, "common.processing"), lang_code=lang_code)
+    
+    # Merging and pending/processing messages carry no values
+    if status not in (DownloadStatus.DOWNLOADING, DownloadStatus.UPLOADING):
+        return lambda *_: template
+    
+    if lang_code == "fa":
+        digits = to_persian_digits
+        size = partial(format_size_localized, lang_code="fa")
+        unknown = "نامشخص"
+    else:
+        digits = str
+        size = format_file_size
+        unknown = "Unknown"
+    speed_lang = "fa" if lang_code == "fa" else "en"
+    
+    def formatter(
+        progress: float,
+        downloaded_bytes: int,
+        total_bytes: int,
+        speed: float,
+        eta: int,
+        quality: str
+    ) -> str:
+        # Progress bar (cells are cached per fill level)
+        fraction = max(0.0, min(1.0, progress / 100))
+        progress_bar = f"{_progress_bar_cells(int(20 * fraction))} {digits(f'{fraction * 100:.1f}%')}"
+        downloaded = size(downloaded_bytes)
+        
+        return template.format_map({
+            "progress_bar": progress_bar,
+            "percentage": digits(f"{progress:.1f}%"),
+            "downloaded": downloaded,
+            "uploaded": downloaded,  # For upload progress
+            "total": size(total_bytes) if total_bytes else unknown,
+            "speed": format_speed(speed, speed_lang),
+            "eta": format_duration_text(eta, speed_lang, short=True) if eta else unknown,
+            "quality": quality or "N/A",
+        })
+    
+    return formatter
+
+
 class ProgressTracker:
     """
     Tracks download progress and handles Telegram message updates.
     Implements debouncing to avoid flood wait errors.
     """
     
+    # Message formatters keyed by (lang_code, status), built on first use
+    _FORMATTERS: Dict[Tuple[str, DownloadStatus], ProgressFormatter] = {}
+    
     def __init__(
         self,
         client: Client,
@@ -994,51 +1717,26 @@ class ProgressTracker:
         self.eta = 0
         self.quality = ""
         self.filename = ""
+        self._bind_formatter()
+    
+    def _bind_formatter(self) -> None:
+        """Pick the formatter for the current language and status."""
+        cache_key = (self.lang_code, self.status)
+        formatter = self._FORMATTERS.get(cache_key)
+        if formatter is None:
+            formatter = _build_progress_formatter(self.lang_code, self.status)
+            self._FORMATTERS[cache_key] = formatter
+        self._formatter = formatter
     
     def _format_progress_message(self) -> str:
         """Generate formatted progress message."""
-        # Progress bar
-        progress_bar = generate_progress_bar(
-            self.progress / 100 if self.progress <= 100 else 1.0,
-            length=20,
-            lang_code=self.lang_code
-        )
-        
-        # Format values based on language
-        if self.lang_code == "fa":
-            percentage = to_persian_digits(f"{self.progress:.1f}%")
-            downloaded = format_size_localized(self.downloaded_bytes, "fa")
-            total = format_size_localized(self.total_bytes, "fa") if self.total_bytes else "نامشخص"
-            speed = format_speed(self.speed, "fa")
-            eta_text = format_duration_text(self.eta, "fa", short=True) if self.eta else "نامشخص"
-        else:
-            percentage = f"{self.progress:.1f}%"
-            downloaded = format_file_size(self.downloaded_bytes)
-            total = format_file_size(self.total_bytes) if self.total_bytes else "Unknown"
-            speed = format_speed(self.speed, "en")
-            eta_text = format_duration_text(self.eta, "en", short=True) if self.eta else "Unknown"
-        
-        # Get status-specific message
-        if self.status == DownloadStatus.DOWNLOADING:
-            status_key = "download.progress"
-        elif self.status == DownloadStatus.MERGING:
-            return get_text("download.merging", lang_code=self.lang_code)
-        elif self.status == DownloadStatus.UPLOADING:
-            status_key = "download.uploading"
-        else:
-            return get_text("common.processing", lang_code=self.lang_code)
-        
-        return get_text(
-            status_key,
-            lang_code=self.lang_code,
-            progress_bar=progress_bar,
-            percentage=percentage,
-            downloaded=downloaded,
-            uploaded=downloaded,  # For upload progress
-            total=total,
-            speed=speed,
-            eta=eta_text,
-            quality=self.quality or "N/A"
+        return self._formatter(
+            self.progress,
+            self.downloaded_bytes,
+            self.total_bytes,
+            self.speed,
+            self.eta,
+            self.quality
         )
     
     async def update(
@@ -1065,8 +1763,9 @@ class ProgressTracker:
         """
         async with self._lock:
             # Update values if provided
-            if status is not None:
+            if status is not None and status != self.status:
                 self.status = status
+                self._bind_formatter()
             if progress is not None:
                 self.progress = progress
             if downloaded_bytes is not None:
@@ -1079,7 +1778,7 @@ class ProgressTracker:
                 self.eta = eta
             
             # Check if we should update the message
-            current_time = time.time()
+            current_time = time.monotonic()
             if not force and current_time - self._last_update < self._update_interval:
                 return
             
@@ -1095,8 +1794,7 @@ class ProgressTracker:
                 await self.client.edit_message_text(
                     chat_id=self.chat_id,
                     message_id=self.message_id,
-                    text=new_text,
-                    parse_mode=enums.ParseMode.HTML
+                    text=new_text
                 )
                 self._last_text = new_text
                 self._last_update = current_time
@@ -1119,22 +1817,30 @@ class ProgressTracker:
             await self.client.edit_message_text(
                 chat_id=self.chat_id,
                 message_id=self.message_id,
-                text=text,
-                parse_mode=enums.ParseMode.HTML
+                text=text
             )
         except Exception as e:
             logger.error(f"Error setting completion message: {e}")
 
 
+# Formatters embed the templates they were built from
+add_reload_hook(ProgressTracker._FORMATTERS.clear)
+
+
 class YTDLPProgressHook:
     """
     Progress hook for yt-dlp that updates ProgressTracker.
+    
+    yt-dlp calls the hook from its worker thread, often hundreds of times a
+    second. The hook only records the latest state; a single task started
+    with run() forwards it to the tracker once per update interval.
     """
     
-    def __init__(self, tracker: ProgressTracker, loop: asyncio.AbstractEventLoop):
+    def __init__(self, tracker: ProgressTracker, interval: float = PROGRESS_UPDATE_INTERVAL):
         self.tracker = tracker
-        self.loop = loop
-        self._last_status = None
+        self.interval = interval
+        self._latest: Optional[Dict[str, Any]] = None
+        self._state_lock = threading.Lock()
     
     def __call__(self, d: Dict[str, Any]) -> None:
         """Handle progress callback from yt-dlp."""
@@ -1153,111 +1859,180 @@ class YTDLPProgressHook:
             else:
                 progress = 0
             
-            # Schedule async update
-            asyncio.run_coroutine_threadsafe(
-                self.tracker.update(
-                    status=DownloadStatus.DOWNLOADING,
-                    progress=progress,
-                    downloaded_bytes=downloaded,
-                    total_bytes=total,
-                    speed=speed,
-                    eta=eta
-                ),
-                self.loop
-            )
+            state = {
+                'status': DownloadStatus.DOWNLOADING,
+                'progress': progress,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'speed': speed,
+                'eta': eta,
+            }
         
         elif status == 'finished':
             # Download finished, might need to merge
-            asyncio.run_coroutine_threadsafe(
-                self.tracker.update(
-                    status=DownloadStatus.MERGING,
-                    progress=100,
-                    force=True
-                ),
-                self.loop
-            )
+            state = {'status': DownloadStatus.MERGING, 'progress': 100, 'force': True}
         
-        elif status == 'error':
-            logger.error(f"yt-dlp error: {d.get('error', 'Unknown error')}")
+        else:
+            if status == 'error':
+                logger.error(f"yt-dlp error: {d.get('error', 'Unknown error')}")
+            return
+        
+        with self._state_lock:
+            # A pending forced state (e.g. MERGING) is sticky: a later
+            # 'downloading' tick must not replace it before snapshot() runs
+            pending = self._latest
+            if pending is not None and pending.get('force') and not state.get('force'):
+                return
+            self._latest = state
+    
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Take the latest state not yet forwarded, or None if there is none."""
+        with self._state_lock:
+            state, self._latest = self._latest, None
+        return state
+    
+    async def flush(self) -> None:
+        """Forward the latest state to the tracker, if any."""
+        state = self.snapshot()
+        if state:
+            await self.tracker.update(**state)
+    
+    async def run(self) -> None:
+        """Forward progress every interval until cancelled."""
+        while True:
+            await self.flush()
+            await asyncio.sleep(self.interval)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # VIDEO INFO EXTRACTION
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Shared worker threads for blocking yt-dlp calls (bounded by the global download limit)
+YTDLP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=config.rate_limit.global_concurrent_limit,
+    thread_name_prefix="ytdlp"
+)
+atexit.register(YTDLP_EXECUTOR.shutdown, wait=False)
+
+def make_cache_key(namespace: str, value: str) -> str:
+    """Build a short, fixed-length cache key (xxh3-128, or BLAKE2b without xxhash)."""
+    data = value.encode('utf-8')
+    if xxhash is not None:
+        digest = xxhash.xxh3_128_hexdigest(data)
+    else:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+async def load_user_cookies(user_id: int, url: str) -> Optional[io.StringIO]:
+    """
+    Load a user's saved cookies for the URL's platform.
+    
+    The decrypted cookies are handed to yt-dlp as an in-memory stream, so
+    they are never written to disk in plain text.
+    
+    Args:
+        user_id: User ID for cookie lookup
+        url: Video URL (selects the platform)
+        
+    Returns:
+        Netscape-format cookie stream, or None if there are no usable cookies
+    """
+    platform = detect_platform(url)
+    if platform == Platform.UNKNOWN:
+        return None
+    
+    cookie_data = await db.get_cookie(user_id, platform.value)
+    if not cookie_data:
+        return None
+    
+    try:
+        return io.StringIO(cookie_encryption.decrypt(cookie_data))
+    except Exception as e:
+        logger.error(f"Error decrypting cookie: {e}")
+        return None
+
+
+def cookie_fingerprint(cookies: Optional[io.StringIO]) -> str:
+    """Identify a cookie set without keeping its contents ("" for no cookies)."""
+    return make_cache_key("cookies", cookies.getvalue()) if cookies else ""
+
+
 async def extract_video_info(
     url: str,
     user_id: Optional[int] = None,
     use_cookies: bool = True
-) -> Optional[VideoInfo]:
+) -> Tuple[Optional[VideoInfo], Optional[ExtractedInfo]]:
     """
     Extract video information using yt-dlp.
     
+    The VideoInfo is cached per URL and shared between users; the raw info
+    dict is not, and is only returned from a fresh extraction.
+    
     Args:
         url: Video URL
         user_id: User ID for cookie lookup
         use_cookies: Whether to use saved cookies
         
     Returns:
-        VideoInfo object or None if extraction failed
+        Tuple of (VideoInfo or None if extraction failed, raw info for reuse
+        by the download or None)
     """
     # Check cache first
-    cache_key = f"video_info:{hashlib.md5(url.encode()).hexdigest()}"
-    cached = await bot_state.get_cached(cache_key, ttl=300)
+    cache_key = make_cache_key("video_info", url)
+    cached = bot_state.get_cached(cache_key, ttl=300)
     if cached:
-        logger.debug(f"Using cached video info for {url}")
-        return cached
+        logger.debug("Using cached video info for %s", url)
+        return cached, None
     
-    # Prepare cookie file if available
-    cookie_file = None
-    if use_cookies and user_id:
-        platform = detect_platform(url)
-        if platform != Platform.UNKNOWN:
-            cookie_data = await db.get_cookie(user_id, platform.value)
-            if cookie_data:
-                try:
-                    decrypted = cookie_encryption.decrypt(cookie_data)
-                    cookie_file = COOKIES_DIR / f"temp_{user_id}_{platform.value}.txt"
-                    async with aiofiles.open(cookie_file, 'w') as f:
-                        await f.write(decrypted)
-                except Exception as e:
-                    logger.error(f"Error decrypting cookie: {e}")
+    # Load saved cookies, if any
+    cookies = await load_user_cookies(user_id, url) if use_cookies and user_id else None
+    cookie_key = cookie_fingerprint(cookies)
     
     # Get yt-dlp options
-    ydl_opts = get_info_extract_options(config, cookie_file)
+    ydl_opts = get_info_extract_options(config, cookies)
     
     try:
         # Run extraction in thread pool
         loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as executor:
-            info = await loop.run_in_executor(
-                executor,
-                lambda: _extract_info_sync(url, ydl_opts)
-            )
+        info = await loop.run_in_executor(YTDLP_EXECUTOR, _extract_info_sync, url, ydl_opts)
         
         if not info:
-            return None
+            return None, None
         
-        # Parse formats
-        formats = []
+        # Parse formats: the quality menu only needs one entry per
+        # (height, audio-only) pair, and storyboard images are never offered.
+        # yt-dlp lists formats worst to best, so the last one per pair wins
+        best_formats: Dict[Tuple[int, bool], Dict[str, Any]] = {}
         for fmt in info.get('formats', []):
-            if fmt.get('format_id'):
-                format_info = FormatInfo(
-                    format_id=fmt.get('format_id', ''),
-                    ext=fmt.get('ext', 'mp4'),
-                    quality=fmt.get('format_note', '') or fmt.get('quality', ''),
-                    height=fmt.get('height', 0) or 0,
-                    width=fmt.get('width', 0) or 0,
-                    fps=fmt.get('fps', 0) or 0,
-                    filesize=fmt.get('filesize', 0) or fmt.get('filesize_approx', 0) or 0,
-                    vcodec=fmt.get('vcodec', ''),
-                    acodec=fmt.get('acodec', ''),
-                    abr=fmt.get('abr', 0) or 0,
-                    vbr=fmt.get('vbr', 0) or 0,
-                    is_audio_only=fmt.get('vcodec') == 'none',
-                    format_note=fmt.get('format_note', '')
-                )
-                formats.append(format_info.__dict__)
+            if not fmt.get('format_id'):
+                continue
+            vcodec = fmt.get('vcodec', '')
+            if vcodec == 'none' and fmt.get('acodec') == 'none':
+                continue
+            format_key = (fmt.get('height') or 0, vcodec == 'none')
+            best_formats[format_key] = fmt
+        
+        formats = []
+        for fmt in best_formats.values():
+            vcodec = fmt.get('vcodec', '')
+            format_info = FormatInfo(
+                format_id=fmt.get('format_id', ''),
+                ext=fmt.get('ext', 'mp4'),
+                quality=fmt.get('format_note', '') or fmt.get('quality', ''),
+                height=fmt.get('height', 0) or 0,
+                width=fmt.get('width', 0) or 0,
+                fps=fmt.get('fps', 0) or 0,
+                filesize=fmt.get('filesize', 0) or fmt.get('filesize_approx', 0) or 0,
+                vcodec=vcodec,
+                acodec=fmt.get('acodec', ''),
+                abr=fmt.get('abr', 0) or 0,
+                vbr=fmt.get('vbr', 0) or 0,
+                is_audio_only=vcodec == 'none',
+                format_note=fmt.get('format_note', '')
+            )
+            formats.append(asdict(format_info))
         
         # Detect platform
         platform = detect_platform(url)
@@ -1283,21 +2058,13 @@ async def extract_video_info(
         )
         
         # Cache the result
-        await bot_state.set_cached(cache_key, video_info)
+        bot_state.set_cached(cache_key, video_info)
         
-        return video_info
+        return video_info, ExtractedInfo(info, user_id, cookie_key)
         
     except Exception as e:
         logger.error(f"Error extracting video info: {e}")
-        return None
-    
-    finally:
-        # Clean up temp cookie file
-        if cookie_file and cookie_file.exists():
-            try:
-                cookie_file.unlink()
-            except:
-                pass
+        return None, None
 
 
 def _extract_info_sync(url: str, ydl_opts: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -1317,13 +2084,18 @@ def _extract_info_sync(url: str, ydl_opts: Dict[str, Any]) -> Optional[Dict[str,
 # VIDEO DOWNLOAD FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Extensions accepted when locating a finished download by name
+DOWNLOAD_EXTENSIONS = frozenset({'mp4', 'mkv', 'webm', 'mp3', 'm4a'})
+
+
 async def download_video(
     url: str,
     output_path: Path,
     quality: str = "1080",
     user_id: Optional[int] = None,
     progress_tracker: Optional[ProgressTracker] = None,
-    audio_only: bool = False
+    audio_only: bool = False,
+    info: Optional[ExtractedInfo] = None
 ) -> Tuple[bool, Optional[Path], str]:
     """
     Download video using yt-dlp.
@@ -1335,30 +2107,26 @@ async def download_video(
         user_id: User ID for cookies
         progress_tracker: Progress tracking object
         audio_only: Download audio only
+        info: Earlier extraction, reused to skip re-fetching if it was made
+            for this user with the same cookies
         
     Returns:
         Tuple of (success, file_path, error_message)
     """
-    # Prepare cookie file
-    cookie_file = None
-    if user_id:
-        platform = detect_platform(url)
-        if platform != Platform.UNKNOWN:
-            cookie_data = await db.get_cookie(user_id, platform.value)
-            if cookie_data:
-                try:
-                    decrypted = cookie_encryption.decrypt(cookie_data)
-                    cookie_file = COOKIES_DIR / f"temp_{user_id}_{platform.value}.txt"
-                    async with aiofiles.open(cookie_file, 'w') as f:
-                        await f.write(decrypted)
-                except Exception as e:
-                    logger.error(f"Error decrypting cookie: {e}")
+    # Load saved cookies, if any
+    cookies = await load_user_cookies(user_id, url) if user_id else None
+    
+    # Anything else (another user, changed cookies) is extracted afresh
+    raw_info = None
+    if info and info.user_id == user_id and info.cookie_key == cookie_fingerprint(cookies):
+        raw_info = info.info
     
     # Set up progress hook
     loop = asyncio.get_event_loop()
     progress_hook = None
+    progress_task = None
     if progress_tracker:
-        progress_hook = YTDLPProgressHook(progress_tracker, loop)
+        progress_hook = YTDLPProgressHook(progress_tracker)
     
     # Get yt-dlp options
     ydl_opts = get_ytdlp_options(
@@ -1366,17 +2134,16 @@ async def download_video(
         quality=quality,
         audio_only=audio_only,
         output_path=output_path,
-        cookie_file=cookie_file,
+        cookie_file=cookies,
         progress_hook=progress_hook
     )
     
     try:
+        if progress_hook:
+            progress_task = asyncio.create_task(progress_hook.run())
+        
         # Run download in thread pool
-        with ThreadPoolExecutor() as executor:
-            result = await loop.run_in_executor(
-                executor,
-                lambda: _download_sync(url, ydl_opts)
-            )
+        result = await loop.run_in_executor(YTDLP_EXECUTOR, _download_sync, url, ydl_opts, raw_info)
         
         if result['success']:
             # Find the downloaded file
@@ -1384,12 +2151,12 @@ async def download_video(
             if downloaded_file and Path(downloaded_file).exists():
                 return True, Path(downloaded_file), ""
             
-            # Try to find the file by pattern
-            for ext in ['mp4', 'mkv', 'webm', 'mp3', 'm4a']:
-                pattern = output_path.parent / f"*{output_path.stem}*.{ext}"
-                files = list(output_path.parent.glob(f"*{output_path.stem}*.{ext}"))
-                if files:
-                    return True, files[0], ""
+            # Fall back to a single directory scan for the output stem
+            stem = output_path.stem
+            with os.scandir(output_path.parent) as entries:
+                for entry in entries:
+                    if stem in entry.name and entry.name.rpartition('.')[2] in DOWNLOAD_EXTENSIONS:
+                        return True, Path(entry.path), ""
             
             return False, None, "Downloaded file not found"
         else:
@@ -1400,25 +2167,54 @@ async def download_video(
         return False, None, str(e)
     
     finally:
-        # Clean up temp cookie file
-        if cookie_file and cookie_file.exists():
+        # Stop forwarding progress, delivering whatever arrived last
+        if progress_task:
+            progress_task.cancel()
             try:
-                cookie_file.unlink()
-            except:
+                await progress_task
+            except asyncio.CancelledError:
                 pass
+            await progress_hook.flush()
 
 
-def _download_sync(url: str, ydl_opts: Dict[str, Any]) -> Dict[str, Any]:
-    """Synchronous wrapper for yt-dlp download."""
+def _download_sync(
+    url: str,
+    ydl_opts: Dict[str, Any],
+    info: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Synchronous wrapper for yt-dlp download.
+    
+    When an info dict from the earlier extraction is supplied, it is fed
+    straight to yt-dlp (like --load-info-json) instead of extracting the
+    page again. Falls back to a fresh extraction if that fails, e.g.
+    because the format URLs have expired. Playlist results (carousels,
+    multi-video posts) are always re-extracted, since sanitize_info drops
+    their entries.
+    """
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+            result = None
+            if info and info.get('_type', 'video') == 'video':
+                try:
+                    result = ydl.process_ie_result(
+                        ydl.sanitize_info(info, remove_private_keys=True),
+                        download=True
+                    )
+                except yt_dlp.utils.YoutubeDLError as e:
+                    logger.warning(f"Download from cached info failed, re-extracting: {e}")
+            
+            info = result or ydl.extract_info(url, download=True)
             if info:
-                filename = ydl.prepare_filename(info)
-                # Handle merged output
-                if ydl_opts.get('merge_output_format'):
-                    base, _ = os.path.splitext(filename)
-                    filename = f"{base}.{ydl_opts['merge_output_format']}"
+                # yt-dlp records the final path (after merging/post-processing)
+                requested = info.get('requested_downloads') or [{}]
+                filename = requested[-1].get('filepath') or info.get('filepath')
+                if not filename:
+                    filename = ydl.prepare_filename(info)
+                    # Handle merged output
+                    if ydl_opts.get('merge_output_format'):
+                        base, _ = os.path.splitext(filename)
+                        filename = f"{base}.{ydl_opts['merge_output_format']}"
                 return {'success': True, 'filename': filename, 'info': info}
             return {'success': False, 'error': 'No info returned'}
     except yt_dlp.utils.DownloadError as e:
@@ -1436,6 +2232,47 @@ def _download_sync(url: str, ydl_opts: Dict[str, Any]) -> Dict[str, Any]:
         return {'success': False, 'error': str(e)}
 
 
+# Minimum seconds between progress updates while streaming a direct link
+DIRECT_PROGRESS_INTERVAL = 0.25
+
+# Bytes buffered from the network before handing a write to the executor
+DIRECT_WRITE_BUFFER = 4 * 1024 * 1024
+
+# Shared HTTP session (created lazily inside the running event loop)
+HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get the shared aiohttp session, creating it on first use.
+    
+    Reusing one session keeps connections alive and caches DNS, so repeat
+    downloads from the same host skip the TCP/TLS handshake.
+    """
+    global HTTP_SESSION
+    
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=75
+            ),
+            timeout=aiohttp.ClientTimeout(total=config.download.timeout)
+        )
+    return HTTP_SESSION
+
+
+async def close_http_session() -> None:
+    """Close the shared aiohttp session if it was opened."""
+    global HTTP_SESSION
+    
+    if HTTP_SESSION is not None:
+        await HTTP_SESSION.close()
+        HTTP_SESSION = None
+
+
 async def download_direct_link(
     url: str,
     output_path: Path,
@@ -1453,49 +2290,79 @@ async def download_direct_link(
         Tuple of (success, file_path, error_message)
     """
     try:
-        timeout = aiohttp.ClientTimeout(total=config.download.timeout)
+        session = await get_http_session()
         
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return False, None, f"HTTP {response.status}"
-                
-                # Get total size
-                total_size = int(response.headers.get('content-length', 0))
-                
-                # Check file size limit
-                if total_size > TELEGRAM_FILE_LIMIT:
-                    return False, None, "file_too_large"
-                
-                # Create output directory
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                # Download with progress
-                downloaded = 0
-                start_time = time.time()
-                
-                async with aiofiles.open(output_path, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(config.download.chunk_size):
-                        await f.write(chunk)
-                        downloaded += len(chunk)
+        async with session.get(url) as response:
+            if response.status != 200:
+                return False, None, f"HTTP {response.status}"
+            
+            # Get total size
+            total_size = int(response.headers.get('content-length', 0))
+            
+            # Check file size limit
+            if total_size > TELEGRAM_FILE_LIMIT:
+                return False, None, "file_too_large"
+            
+            # Create output directory
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            # Download with progress
+            downloaded = 0
+            start_time = time.monotonic()
+            last_progress_emit = 0.0
+            loop = asyncio.get_running_loop()
+            
+            # Chunks are gathered into a buffer and written on the default
+            # executor once it fills, so there is one thread hop per few MiB;
+            # opening and closing the file happen there too
+            buffer = bytearray()
+            f = await loop.run_in_executor(None, open, output_path, 'wb')
+            try:
+                async for chunk in response.content.iter_chunked(config.download.chunk_size):
+                    buffer += chunk
+                    downloaded += len(chunk)
+                    if len(buffer) >= DIRECT_WRITE_BUFFER:
+                        await loop.run_in_executor(None, f.write, buffer)
+                        buffer.clear()
+                    
+                    if progress_tracker:
+                        now = time.monotonic()
+                        if now - last_progress_emit < DIRECT_PROGRESS_INTERVAL:
+                            continue
+                        last_progress_emit = now
                         
-                        if progress_tracker:
-                            elapsed = time.time() - start_time
-                            speed = downloaded / elapsed if elapsed > 0 else 0
-                            eta = int((total_size - downloaded) / speed) if speed > 0 else 0
-                            progress = (downloaded / total_size * 100) if total_size else 0
-                            
-                            await progress_tracker.update(
-                                status=DownloadStatus.DOWNLOADING,
-                                progress=progress,
-                                downloaded_bytes=downloaded,
-                                total_bytes=total_size,
-                                speed=speed,
-                                eta=eta
-                            )
-                
-                return True, output_path, ""
+                        elapsed = now - start_time
+                        speed = downloaded / elapsed if elapsed > 0 else 0
+                        eta = int((total_size - downloaded) / speed) if speed > 0 else 0
+                        progress = (downloaded / total_size * 100) if total_size else 0
+                        
+                        await progress_tracker.update(
+                            status=DownloadStatus.DOWNLOADING,
+                            progress=progress,
+                            downloaded_bytes=downloaded,
+                            total_bytes=total_size,
+                            speed=speed,
+                            eta=eta
+                        )
                 
+                # Write whatever is left after the last full buffer
+                if buffer:
+                    await loop.run_in_executor(None, f.write, buffer)
+            finally:
+                await loop.run_in_executor(None, f.close)
+            
+            # Final progress update, past the debounce so 100% is shown
+            if progress_tracker:
+                await progress_tracker.update(
+                    progress=100,
+                    downloaded_bytes=downloaded,
+                    total_bytes=total_size or downloaded,
+                    eta=0,
+                    force=True
+                )
+            
+            return True, output_path, ""
+            
     except asyncio.TimeoutError:
         return False, None, "timeout"
     except aiohttp.ClientError as e:
@@ -1510,39 +2377,105 @@ async def download_direct_link(
 # ═══════════════════════════════════════════════════════════════════════════════
 
 def generate_task_id() -> str:
-    """Generate unique task ID."""
-    return str(uuid.uuid4())[:8]
+    """Generate unique task ID (12 URL-safe chars, 72 bits of entropy)."""
+    return secrets.token_urlsafe(9)
+
+
+def describe_error(error: Exception, limit: int = 100) -> str:
+    """
+    Describe an exception for a user-facing message.
+    
+    Args:
+        error: The exception
+        limit: Maximum length of the exception message
+        
+    Returns:
+        HTML-escaped "ExceptionType: message", truncated
+    """
+    return escape_html(f"{type(error).__name__}: {truncate_text(str(error), limit)}")
+
+
+# How stale last_active may get before a message writes it again
+USER_TOUCH_INTERVAL = timedelta(minutes=1)
 
 
 async def get_or_create_user(message: Message) -> UserData:
-    """Get or create user data from message."""
-    user = message.from_user
-    user_data = await db.get_user(user.id)
+    """
+    Get or create user data from message.
     
-    if not user_data:
-        user_data = await db.create_or_update_user(
-            user_id=user.id,
-            username=user.username or "",
-            first_name=user.first_name or "",
-            last_name=user.last_name or "",
-            language=DEFAULT_LANGUAGE
-        )
-    else:
-        # Update last active
-        await db.create_or_update_user(
+    Reuses the record the decorators already fetched for this message, and
+    skips the write when the profile is unchanged and last_active is fresh.
+    """
+    user = message.from_user
+    username = user.username or ""
+    first_name = user.first_name or ""
+    last_name = user.last_name or ""
+    
+    user_data = await get_request_user(message)
+    if (
+        user_data is None
+        or (user_data.username, user_data.first_name, user_data.last_name)
+        != (username, first_name, last_name)
+        or datetime.now() - user_data.last_active >= USER_TOUCH_INTERVAL
+    ):
+        user_data = await db.upsert_and_touch(
             user_id=user.id,
-            username=user.username or "",
-            first_name=user.first_name or "",
-            last_name=user.last_name or "",
-            last_active=datetime.now()
+            username=username,
+            first_name=first_name,
+            last_name=last_name
         )
     
-    # Sync language preference
-    set_user_language(user.id, user_data.language)
+    # Sync language preference (only when it differs from the in-memory one)
+    if get_user_language(user.id) != user_data.language:
+        set_user_language(user.id, user_data.language)
     
+    ctx = get_request_context(message)
+    ctx["user"] = user_data
+    ctx["lang"] = user_data.language
     return user_data
 
 
+def get_request_context(message: Message) -> Dict[str, Any]:
+    """
+    Get the scratch dict for values looked up while handling one message.
+    
+    It lives on the message itself, so it is shared by the decorator chain
+    and the handler and discarded along with the update.
+    """
+    return message.__dict__.setdefault("_ctx", {})
+
+
+async def get_request_user(message: Message) -> Optional[UserData]:
+    """Get the sender's user record, fetched at most once per message."""
+    ctx = get_request_context(message)
+    if "user" not in ctx:
+        ctx["user"] = await db.get_user(message.from_user.id)
+    return ctx["user"]
+
+
+def get_request_language(message: Message) -> str:
+    """Get the sender's language, looked up at most once per message."""
+    ctx = get_request_context(message)
+    lang_code = ctx.get("lang")
+    if lang_code is None:
+        lang_code = ctx["lang"] = get_user_language(message.from_user.id)
+    return lang_code
+
+
+# Standard heights (best first) and their button emoji
+QUALITY_ORDER: Tuple[int, ...] = (2160, 1440, 1080, 720, 480, 360, 240)
+QUALITY_EMOJIS: Dict[int, str] = {
+    2160: "🔵",
+    1440: "🟣",
+    1080: "🟢",
+    720: "🟡",
+    480: "🟠",
+    360: "🔴",
+    240: "⚫️",
+}
+QUALITY_BITS: Dict[int, int] = {height: 1 << i for i, height in enumerate(QUALITY_ORDER)}
+
+
 def create_quality_keyboard(
     formats: List[Dict[str, Any]],
     task_id: str,
@@ -1561,34 +2494,31 @@ def create_quality_keyboard(
     """
     buttons = []
     
-    # Get unique heights and sort
-    heights = set()
+    # Single pass: standard heights go into a bitmask, anything else into a set
+    seen = 0
+    other_heights = set()
     audio_available = False
     
     for fmt in formats:
         height = fmt.get('height', 0)
         if height and height > 0:
-            heights.add(height)
+            bit = QUALITY_BITS.get(height)
+            if bit:
+                seen |= bit
+            else:
+                other_heights.add(height)
         if fmt.get('is_audio_only'):
             audio_available = True
     
-    heights = sorted(heights, reverse=True)
+    # Standard heights come out already ordered; only odd sizes need a sort
+    heights = [height for height in QUALITY_ORDER if seen & QUALITY_BITS[height]]
+    if other_heights:
+        heights = sorted(other_heights.union(heights), reverse=True)
     
     # Quality buttons
-    quality_map = {
-        2160: ("4k", "🔵"),
-        1440: ("2k", "🟣"),
-        1080: ("1080p", "🟢"),
-        720: ("720p", "🟡"),
-        480: ("480p", "🟠"),
-        360: ("360p", "🔴"),
-        240: ("240p", "⚫️"),
-    }
-    
     row = []
     for height in heights[:6]:  # Limit to 6 options
-        label_key, emoji = quality_map.get(height, (f"{height}p", "⚪️"))
-        label = f"{emoji} {height}p"
+        label = f"{QUALITY_EMOJIS.get(height, '⚪️')} {height}p"
         callback_data = f"dl:{task_id}:{height}"
         row.append(InlineKeyboardButton(label, callback_data=callback_data))
         
@@ -1627,8 +2557,9 @@ def create_quality_keyboard(
     return InlineKeyboardMarkup(buttons)
 
 
+@lru_cache(maxsize=1)
 def create_language_keyboard() -> InlineKeyboardMarkup:
-    """Create language selection keyboard."""
+    """Create language selection keyboard (built once; it never changes)."""
     buttons = []
     
     for lang_code, lang_info in SUPPORTED_LANGUAGES.items():
@@ -1644,64 +2575,317 @@ def create_language_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-async def cleanup_temp_files(max_age_hours: int = 24) -> Tuple[int, int]:
-    """
-    Clean up old temporary files.
-    
-    Args:
-        max_age_hours: Maximum age of files in hours
-        
-    Returns:
-        Tuple of (files_deleted, bytes_freed)
-    """
-    files_deleted = 0
-    bytes_freed = 0
-    cutoff = datetime.now() - timedelta(hours=max_age_hours)
-    
-    for directory in [TEMP_DIR, DOWNLOADS_DIR]:
-        if not directory.exists():
-            continue
-            
-        for file_path in directory.rglob('*'):
-            if file_path.is_file():
-                try:
-                    mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    if mtime < cutoff:
-                        size = file_path.stat().st_size
-                        file_path.unlink()
-                        files_deleted += 1
-                        bytes_freed += size
-                except Exception as e:
-                    logger.error(f"Error cleaning up {file_path}: {e}")
-    
-    logger.info(f"Cleanup: deleted {files_deleted} files, freed {format_file_size(bytes_freed)}")
-    return files_deleted, bytes_freed
-
+# The keyboards below depend only on their arguments, so each variant is
+# built once and shared. Callers must not modify the returned markup.
 
-async def send_video_to_user(
-    client: Client,
-    chat_id: int,
-    file_path: Path,
-    video_info: VideoInfo,
-    progress_tracker: Optional[ProgressTracker] = None
-) -> bool:
+@lru_cache(maxsize=32)
+def create_main_menu_keyboard(lang_code: str, show_admin: bool = False) -> InlineKeyboardMarkup:
     """
-    Send downloaded video to user via Telegram.
+    Create the /start main menu keyboard.
     
     Args:
-        client: Pyrogram client
-        chat_id: Chat ID to send to
-        file_path: Path to video file
-        video_info: Video information
-        progress_tracker: Progress tracker for upload
+        lang_code: Language code for button labels
+        show_admin: Whether to add the admin panel button
         
     Returns:
-        True if successful, False otherwise
+        InlineKeyboardMarkup
     """
-    try:
-        file_size = file_path.stat().st_size
-        
-        # Check file size
+    buttons = [
+        [
+            InlineKeyboardButton(
+                get_text("buttons.help", lang_code=lang_code),
+                callback_data="menu:help"
+            ),
+            InlineKeyboardButton(
+                get_text("buttons.language", lang_code=lang_code),
+                callback_data="menu:language"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                get_text("buttons.stats", lang_code=lang_code),
+                callback_data="menu:stats"
+            ),
+            InlineKeyboardButton(
+                get_text("buttons.history", lang_code=lang_code),
+                callback_data="menu:history"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                get_text("buttons.cookie", lang_code=lang_code),
+                callback_data="menu:cookie"
+            ),
+            InlineKeyboardButton(
+                get_text("buttons.quality", lang_code=lang_code),
+                callback_data="menu:quality"
+            )
+        ]
+    ]
+    
+    # Add admin button for admins
+    if show_admin:
+        buttons.append([
+            InlineKeyboardButton(
+                get_text("buttons.admin", lang_code=lang_code),
+                callback_data="menu:admin"
+            )
+        ])
+    
+    return InlineKeyboardMarkup(buttons)
+
+
+@lru_cache(maxsize=16)
+def create_help_keyboard(lang_code: str) -> InlineKeyboardMarkup:
+    """Create the /help topics keyboard."""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(
+                "🍪 " + get_text("buttons.cookie", lang_code=lang_code),
+                callback_data="help:cookie"
+            ),
+            InlineKeyboardButton(
+                "📊 " + get_text("buttons.quality", lang_code=lang_code),
+                callback_data="help:quality"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "🌐 " + get_text("video_info.platform", lang_code=lang_code),
+                callback_data="help:platforms"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                get_text("buttons.back", lang_code=lang_code),
+                callback_data="menu:main"
+            )
+        ]
+    ])
+
+
+@lru_cache(maxsize=64)
+def create_back_keyboard(lang_code: str, callback_data: str = "menu:main") -> InlineKeyboardMarkup:
+    """Create a single "back" button keyboard pointing at the given menu."""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(
+            get_text("buttons.back", lang_code=lang_code),
+            callback_data=callback_data
+        )
+    ]])
+
+
+# Default-quality choices offered by /quality
+DEFAULT_QUALITY_CHOICES: Tuple[Tuple[str, str], ...] = (
+    ("2160", "🔵 4K"),
+    ("1440", "🟣 2K"),
+    ("1080", "🟢 1080p"),
+    ("720", "🟡 720p"),
+    ("480", "🟠 480p"),
+    ("360", "🔴 360p"),
+)
+
+
+@lru_cache(maxsize=64)
+def create_default_quality_keyboard(lang_code: str, current_quality: str) -> InlineKeyboardMarkup:
+    """
+    Create the /quality keyboard with the current default marked.
+    
+    Args:
+        lang_code: Language code for button labels
+        current_quality: User's current default quality
+        
+    Returns:
+        InlineKeyboardMarkup
+    """
+    buttons = []
+    row = []
+    for quality, label in DEFAULT_QUALITY_CHOICES:
+        # Mark current default
+        if quality == current_quality:
+            label = f"✓ {label}"
+        row.append(InlineKeyboardButton(label, callback_data=f"setquality:{quality}"))
+        if len(row) == 3:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    
+    buttons.append([
+        InlineKeyboardButton(
+            get_text("buttons.back", lang_code=lang_code),
+            callback_data="menu:main"
+        )
+    ])
+    
+    return InlineKeyboardMarkup(buttons)
+
+
+@lru_cache(maxsize=16)
+def create_admin_panel_keyboard(lang_code: str) -> InlineKeyboardMarkup:
+    """Create the admin panel keyboard."""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(
+                get_text("buttons.broadcast", lang_code=lang_code),
+                callback_data="admin:broadcast"
+            ),
+            InlineKeyboardButton(
+                get_text("buttons.users", lang_code=lang_code),
+                callback_data="admin:users"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                get_text("buttons.cleanup", lang_code=lang_code),
+                callback_data="admin:cleanup"
+            ),
+            InlineKeyboardButton(
+                get_text("buttons.refresh", lang_code=lang_code),
+                callback_data="admin:refresh"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                get_text("buttons.back", lang_code=lang_code),
+                callback_data="menu:main"
+            )
+        ]
+    ])
+
+
+def _iter_files(directory: str) -> Iterator[os.DirEntry]:
+    """Recursively yield regular files under a directory (no symlink following)."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def _cleanup_temp_files_sync(cutoff_ts: float) -> Tuple[int, int]:
+    """Delete files older than cutoff_ts (blocking; run in an executor)."""
+    files_deleted = 0
+    bytes_freed = 0
+    
+    for directory in [TEMP_DIR, DOWNLOADS_DIR]:
+        if not directory.exists():
+            continue
+        
+        for entry in _iter_files(str(directory)):
+            try:
+                st = entry.stat(follow_symlinks=False)
+                if st.st_mtime < cutoff_ts:
+                    os.unlink(entry.path)
+                    files_deleted += 1
+                    bytes_freed += st.st_size
+            except Exception as e:
+                logger.error(f"Error cleaning up {entry.path}: {e}")
+    
+    return files_deleted, bytes_freed
+
+
+async def cleanup_temp_files(max_age_hours: int = 24) -> Tuple[int, int]:
+    """
+    Clean up old temporary files.
+    
+    Args:
+        max_age_hours: Maximum age of files in hours
+        
+    Returns:
+        Tuple of (files_deleted, bytes_freed)
+    """
+    cutoff_ts = time.time() - max_age_hours * 3600
+    loop = asyncio.get_running_loop()
+    files_deleted, bytes_freed = await loop.run_in_executor(
+        None, _cleanup_temp_files_sync, cutoff_ts
+    )
+    
+    logger.info("Cleanup: deleted %d files, freed %s", files_deleted, format_file_size(bytes_freed))
+    return files_deleted, bytes_freed
+
+
+# Minimum seconds between upload progress updates
+UPLOAD_PROGRESS_INTERVAL = 2.0
+
+# Files sent with send_audio instead of send_video
+AUDIO_EXTENSIONS = frozenset({'.mp3', '.m4a', '.aac', '.ogg', '.opus', '.wav', '.flac'})
+
+# Thumbnails are small; don't hold up the upload waiting for a slow host
+THUMBNAIL_TIMEOUT = aiohttp.ClientTimeout(total=5)
+THUMBNAIL_MAX_SIZE = 1024 * 1024
+
+
+async def fetch_thumbnail(url: str) -> Optional[str]:
+    """
+    Download a video thumbnail into TEMP_DIR.
+    
+    Args:
+        url: Thumbnail URL
+        
+    Returns:
+        Path of the saved thumbnail, or None if it couldn't be fetched
+    """
+    thumb_path = TEMP_DIR / f"thumb_{generate_task_id()}.jpg"
+    thumb = None
+    
+    try:
+        session = await get_http_session()
+        async with session.get(url, timeout=THUMBNAIL_TIMEOUT) as resp:
+            if resp.status != 200:
+                return None
+            
+            # Stream to disk, giving up on oversized responses
+            received = 0
+            async with aiofiles.open(thumb_path, 'wb') as f:
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    received += len(chunk)
+                    if received > THUMBNAIL_MAX_SIZE:
+                        logger.debug("Thumbnail over %d bytes, skipping: %s", THUMBNAIL_MAX_SIZE, url)
+                        return None
+                    await f.write(chunk)
+            thumb = str(thumb_path)
+    
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        logger.debug("Thumbnail fetch failed: %s", e)
+    
+    finally:
+        # Don't leave a partial file behind (including on cancellation)
+        if thumb is None:
+            with suppress(OSError):
+                await aiofiles.os.remove(thumb_path)
+    
+    return thumb
+
+
+async def send_video_to_user(
+    client: Client,
+    chat_id: int,
+    file_path: Path,
+    video_info: VideoInfo,
+    progress_tracker: Optional[ProgressTracker] = None,
+    file_size: Optional[int] = None
+) -> bool:
+    """
+    Send downloaded video to user via Telegram.
+    
+    Args:
+        client: Pyrogram client
+        chat_id: Chat ID to send to
+        file_path: Path to video file
+        video_info: Video information
+        progress_tracker: Progress tracker for upload
+        file_size: File size in bytes, if the caller already has it
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        if file_size is None:
+            file_size = os.stat(file_path).st_size
+        
+        # Check file size
         if file_size > TELEGRAM_FILE_LIMIT:
             logger.error(f"File too large: {format_file_size(file_size)}")
             return False
@@ -1710,9 +2894,22 @@ async def send_video_to_user(
         if progress_tracker:
             await progress_tracker.set_status(DownloadStatus.UPLOADING)
         
-        # Upload progress callback
-        async def upload_progress(current: int, total: int):
-            if progress_tracker:
+        # Upload progress callback, forwarding only whole-percent changes at
+        # most every UPLOAD_PROGRESS_INTERVAL seconds (and the final chunk)
+        upload_progress = None
+        if progress_tracker:
+            last_sent = {"pct": -1, "t": 0.0}
+            
+            async def upload_progress(current: int, total: int):
+                pct = int(current * 100 / total) if total else 0
+                now = time.monotonic()
+                if current < total and (
+                    pct == last_sent["pct"] or now - last_sent["t"] < UPLOAD_PROGRESS_INTERVAL
+                ):
+                    return
+                last_sent["pct"] = pct
+                last_sent["t"] = now
+                
                 await progress_tracker.update(
                     status=DownloadStatus.UPLOADING,
                     progress=(current / total) * 100,
@@ -1722,25 +2919,22 @@ async def send_video_to_user(
         
         # Determine if audio or video
         ext = file_path.suffix.lower()
-        is_audio = ext in ['.mp3', '.m4a', '.aac', '.ogg', '.opus', '.wav', '.flac']
+        is_audio = ext in AUDIO_EXTENSIONS
         
         # Prepare caption
         lang_code = get_user_language(chat_id)
-        caption = get_text(
-            "download.completed",
-            lang_code=lang_code,
-            title=escape_html(truncate_text(video_info.title, 100)),
-            quality=video_info.formats[0].get('quality', 'N/A') if video_info.formats else 'N/A',
-            size=format_size_localized(file_size, lang_code),
-            duration=format_duration_text(video_info.duration, lang_code, short=True)
-        )
+        caption = get_template("download.completed", lang_code).format_map({
+            "title": video_info.title_html,
+            "quality": video_info.formats[0].get('quality', 'N/A') if video_info.formats else 'N/A',
+            "size": format_size_localized(file_size, lang_code),
+            "duration": format_duration_text(video_info.duration, lang_code, short=True),
+        })
         
         if is_audio:
             await client.send_audio(
                 chat_id=chat_id,
                 audio=str(file_path),
                 caption=caption,
-                parse_mode=enums.ParseMode.HTML,
                 duration=video_info.duration,
                 title=video_info.title,
                 performer=video_info.uploader,
@@ -1748,36 +2942,23 @@ async def send_video_to_user(
             )
         else:
             # Try to get thumbnail
-            thumb = None
-            if video_info.thumbnail:
-                try:
-                    thumb_path = TEMP_DIR / f"thumb_{generate_task_id()}.jpg"
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(video_info.thumbnail) as resp:
-                            if resp.status == 200:
-                                async with aiofiles.open(thumb_path, 'wb') as f:
-                                    await f.write(await resp.read())
-                                thumb = str(thumb_path)
-                except:
-                    pass
+            thumb = await fetch_thumbnail(video_info.thumbnail) if video_info.thumbnail else None
             
-            await client.send_video(
-                chat_id=chat_id,
-                video=str(file_path),
-                caption=caption,
-                parse_mode=enums.ParseMode.HTML,
-                duration=video_info.duration,
-                thumb=thumb,
-                supports_streaming=True,
-                progress=upload_progress
-            )
-            
-            # Clean up thumbnail
-            if thumb:
-                try:
-                    Path(thumb).unlink()
-                except:
-                    pass
+            try:
+                await client.send_video(
+                    chat_id=chat_id,
+                    video=str(file_path),
+                    caption=caption,
+                    duration=video_info.duration,
+                    thumb=thumb,
+                    supports_streaming=True,
+                    progress=upload_progress
+                )
+            finally:
+                # Clean up thumbnail (also when the upload fails)
+                if thumb:
+                    with suppress(OSError):
+                        await aiofiles.os.remove(thumb)
         
         return True
         
@@ -1790,12 +2971,18 @@ async def send_video_to_user(
 # DECORATORS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Rejection replies repeat the same few (key, language, arguments) combinations,
+# so the rendered text is memoized; under a burst each reply is a dict hit
+rejection_text = lru_cache(maxsize=256)(get_text)
+add_reload_hook(rejection_text.cache_clear)
+
+
 def rate_limit_check(func: MessageHandler) -> MessageHandler:
     """Decorator to check rate limits before handling message."""
     @wraps(func)
     async def wrapper(client: Client, message: Message):
         user_id = message.from_user.id
-        user_data = await db.get_user(user_id)
+        user_data = await get_request_user(message)
         
         # Get limits based on VIP status
         if user_data and user_data.is_vip:
@@ -1806,32 +2993,30 @@ def rate_limit_check(func: MessageHandler) -> MessageHandler:
             concurrent_limit = config.rate_limit.concurrent_limit
         
         # Check daily limit
-        allowed, remaining = await bot_state.check_rate_limit(user_id, daily_limit)
+        allowed, remaining = bot_state.check_rate_limit(user_id, daily_limit)
         if not allowed:
-            lang_code = get_user_language(user_id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text(
+                rejection_text(
                     "errors.rate_limit",
                     lang_code=lang_code,
                     limit=daily_limit,
                     reset_time="24h"
-                ),
-                parse_mode=enums.ParseMode.HTML
+                )
             )
             return
         
         # Check concurrent limit
-        active_downloads = await bot_state.get_user_download_count(user_id)
+        active_downloads = bot_state.get_user_download_count(user_id)
         if active_downloads >= concurrent_limit:
-            lang_code = get_user_language(user_id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text(
+                rejection_text(
                     "errors.concurrent_limit",
                     lang_code=lang_code,
                     current=active_downloads,
                     max=concurrent_limit
-                ),
-                parse_mode=enums.ParseMode.HTML
+                )
             )
             return
         
@@ -1846,10 +3031,9 @@ def admin_only(func: MessageHandler) -> MessageHandler:
     async def wrapper(client: Client, message: Message):
         user_id = message.from_user.id
         if not is_admin(user_id, config):
-            lang_code = get_user_language(user_id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text("errors.not_admin", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                rejection_text("errors.not_admin", lang_code=lang_code)
             )
             return
         return await func(client, message)
@@ -1863,10 +3047,9 @@ def owner_only(func: MessageHandler) -> MessageHandler:
     async def wrapper(client: Client, message: Message):
         user_id = message.from_user.id
         if not is_owner(user_id, config):
-            lang_code = get_user_language(user_id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text("errors.not_owner", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                rejection_text("errors.not_owner", lang_code=lang_code)
             )
             return
         return await func(client, message)
@@ -1878,18 +3061,16 @@ def check_banned(func: MessageHandler) -> MessageHandler:
     """Decorator to check if user is banned."""
     @wraps(func)
     async def wrapper(client: Client, message: Message):
-        user_id = message.from_user.id
-        user_data = await db.get_user(user_id)
+        user_data = await get_request_user(message)
         
         if user_data and user_data.is_banned:
-            lang_code = get_user_language(user_id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text(
+                rejection_text(
                     "errors.banned",
                     lang_code=lang_code,
                     reason=user_data.ban_reason or "No reason provided"
-                ),
-                parse_mode=enums.ParseMode.HTML
+                )
             )
             return
         
@@ -1907,14 +3088,13 @@ def maintenance_check(func: MessageHandler) -> MessageHandler:
             if is_owner(message.from_user.id, config):
                 return await func(client, message)
             
-            lang_code = get_user_language(message.from_user.id)
+            lang_code = get_request_language(message)
             await message.reply_text(
-                get_text(
+                rejection_text(
                     "errors.maintenance",
                     lang_code=lang_code,
                     message=config.maintenance_message or ""
-                ),
-                parse_mode=enums.ParseMode.HTML
+                )
             )
             return
         
@@ -1966,56 +3146,15 @@ async def start_command(client: Client, message: Message):
             name=escape_html(user_data.full_name)
         )
     
-    # Create main menu keyboard
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton(
-                get_text("buttons.help", lang_code=lang_code),
-                callback_data="menu:help"
-            ),
-            InlineKeyboardButton(
-                get_text("buttons.language", lang_code=lang_code),
-                callback_data="menu:language"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                get_text("buttons.stats", lang_code=lang_code),
-                callback_data="menu:stats"
-            ),
-            InlineKeyboardButton(
-                get_text("buttons.history", lang_code=lang_code),
-                callback_data="menu:history"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                get_text("buttons.cookie", lang_code=lang_code),
-                callback_data="menu:cookie"
-            ),
-            InlineKeyboardButton(
-                get_text("buttons.quality", lang_code=lang_code),
-                callback_data="menu:quality"
-            )
-        ]
-    ])
-    
-    # Add admin button for admins
-    if is_admin(user.id, config):
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(
-                get_text("buttons.admin", lang_code=lang_code),
-                callback_data="menu:admin"
-            )
-        ])
+    # Main menu keyboard (with the admin button for admins)
+    keyboard = create_main_menu_keyboard(lang_code, is_admin(user.id, config))
     
     await message.reply_text(
         get_text("start.welcome", lang_code=lang_code),
-        reply_markup=keyboard,
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=keyboard
     )
     
-    logger.info(f"User {user.id} ({user.username}) started the bot")
+    logger.info("User %s (%s) started the bot", user.id, user.username)
 
 
 @app.on_message(filters.command("help") & filters.private)
@@ -2023,38 +3162,13 @@ async def start_command(client: Client, message: Message):
 @check_banned
 async def help_command(client: Client, message: Message):
     """Handle /help command."""
-    user_data = await get_or_create_user(message)
-    lang_code = user_data.language
+    lang_code = get_request_language(message)
     
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton(
-                "🍪 " + get_text("buttons.cookie", lang_code=lang_code),
-                callback_data="help:cookie"
-            ),
-            InlineKeyboardButton(
-                "📊 " + get_text("buttons.quality", lang_code=lang_code),
-                callback_data="help:quality"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                "🌐 " + get_text("video_info.platform", lang_code=lang_code),
-                callback_data="help:platforms"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                get_text("buttons.back", lang_code=lang_code),
-                callback_data="menu:main"
-            )
-        ]
-    ])
+    keyboard = create_help_keyboard(lang_code)
     
     await message.reply_text(
         get_text("help.main", lang_code=lang_code),
-        reply_markup=keyboard,
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=keyboard
     )
 
 
@@ -2063,13 +3177,11 @@ async def help_command(client: Client, message: Message):
 @check_banned
 async def language_command(client: Client, message: Message):
     """Handle /language command."""
-    user_data = await get_or_create_user(message)
-    lang_code = user_data.language
+    lang_code = get_request_language(message)
     
     await message.reply_text(
         get_text("language.select", lang_code=lang_code),
-        reply_markup=create_language_keyboard(),
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=create_language_keyboard()
     )
 
 
@@ -2078,12 +3190,10 @@ async def language_command(client: Client, message: Message):
 @check_banned
 async def cookie_command(client: Client, message: Message):
     """Handle /cookie command."""
-    user_data = await get_or_create_user(message)
-    lang_code = user_data.language
+    lang_code = get_request_language(message)
     
     await message.reply_text(
-        get_text("help.cookie_guide", lang_code=lang_code),
-        parse_mode=enums.ParseMode.HTML
+        get_text("help.cookie_guide", lang_code=lang_code)
     )
 
 
@@ -2100,40 +3210,31 @@ async def list_cookies_command(client: Client, message: Message):
     
     if not cookies:
         await message.reply_text(
-            get_text("cookie.list_empty", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("cookie.list_empty", lang_code=lang_code)
         )
         return
     
-    # Format cookies list
-    cookies_list = []
-    for i, cookie in enumerate(cookies, 1):
-        platform = cookie['platform']
-        created = cookie['created_at'][:10] if cookie['created_at'] else "N/A"
-        
-        if cookie['is_valid']:
-            status = get_text("cookie.status_valid", lang_code=lang_code)
-        else:
-            status = get_text("cookie.status_expired", lang_code=lang_code)
-        
-        cookies_list.append(
-            get_text(
-                "cookie.list_item",
-                lang_code=lang_code,
-                number=i,
-                platform=platform,
-                date=created,
-                status=status
-            )
-        )
+    # Format cookies list (templates are fetched once, outside the loop)
+    item_template = get_template("cookie.list_item", lang_code)
+    status_valid = get_template("cookie.status_valid", lang_code)
+    status_expired = get_template("cookie.status_expired", lang_code)
+    
+    cookies_list = "\n".join(
+        item_template.format_map({
+            "number": i,
+            "platform": cookie['platform'],
+            "date": cookie['created_at'][:10] if cookie['created_at'] else "N/A",
+            "status": status_valid if cookie['is_valid'] else status_expired,
+        })
+        for i, cookie in enumerate(cookies, 1)
+    )
     
     await message.reply_text(
         get_text(
             "cookie.list_title",
             lang_code=lang_code,
-            cookies_list="\n".join(cookies_list)
-        ),
-        parse_mode=enums.ParseMode.HTML
+            cookies_list=cookies_list
+        )
     )
 
 
@@ -2147,7 +3248,7 @@ async def delete_cookie_command(client: Client, message: Message):
     user_id = message.from_user.id
     
     # Check for platform argument
-    args = message.text.split()[1:] if len(message.text.split()) > 1 else []
+    args = message.text.split(maxsplit=2)[1:]
     
     if args:
         platform = args[0].lower()
@@ -2155,13 +3256,11 @@ async def delete_cookie_command(client: Client, message: Message):
         
         if success:
             await message.reply_text(
-                get_text("cookie.delete_success", lang_code=lang_code, platform=platform),
-                parse_mode=enums.ParseMode.HTML
+                get_text("cookie.delete_success", lang_code=lang_code, platform=platform)
             )
         else:
             await message.reply_text(
-                get_text("cookie.delete_not_found", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                get_text("cookie.delete_not_found", lang_code=lang_code)
             )
     else:
         # Show list of cookies to delete
@@ -2169,8 +3268,7 @@ async def delete_cookie_command(client: Client, message: Message):
         
         if not cookies:
             await message.reply_text(
-                get_text("cookie.list_empty", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                get_text("cookie.list_empty", lang_code=lang_code)
             )
             return
         
@@ -2193,48 +3291,17 @@ async def delete_cookie_command(client: Client, message: Message):
         
         await message.reply_text(
             get_text("cookie.delete_prompt", lang_code=lang_code, cookies_list=""),
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=InlineKeyboardMarkup(buttons)
         )
 
 
-@app.on_message(filters.command("quality") & filters.private)
-@maintenance_check
-@check_banned
-async def quality_command(client: Client, message: Message):
-    """Handle /quality command."""
-    user_data = await get_or_create_user(message)
-    lang_code = user_data.language
-    
-    # Quality options
-    qualities = [
-        ("2160", "🔵 4K"),
-        ("1440", "🟣 2K"),
-        ("1080", "🟢 1080p"),
-        ("720", "🟡 720p"),
-        ("480", "🟠 480p"),
-        ("360", "🔴 360p"),
-    ]
-    
-    buttons = []
-    row = []
-    for quality, label in qualities:
-        # Mark current default
-        if quality == user_data.default_quality:
-            label = f"✓ {label}"
-        row.append(InlineKeyboardButton(label, callback_data=f"setquality:{quality}"))
-        if len(row) == 3:
-            buttons.append(row)
-            row = []
-    if row:
-        buttons.append(row)
-    
-    buttons.append([
-        InlineKeyboardButton(
-            get_text("buttons.back", lang_code=lang_code),
-            callback_data="menu:main"
-        )
-    ])
+@app.on_message(filters.command("quality") & filters.private)
+@maintenance_check
+@check_banned
+async def quality_command(client: Client, message: Message):
+    """Handle /quality command."""
+    user_data = await get_or_create_user(message)
+    lang_code = user_data.language
     
     await message.reply_text(
         get_text(
@@ -2242,8 +3309,7 @@ async def quality_command(client: Client, message: Message):
             lang_code=lang_code,
             quality=user_data.default_quality
         ),
-        reply_markup=InlineKeyboardMarkup(buttons),
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=create_default_quality_keyboard(lang_code, user_data.default_quality)
     )
 
 
@@ -2271,35 +3337,26 @@ async def stats_command(client: Client, message: Message):
         daily_limit = config.rate_limit.daily_limit
         concurrent_limit = config.rate_limit.concurrent_limit
     
-    active_downloads = await bot_state.get_user_download_count(user_data.user_id)
-    
-    # Format stats
+    active_downloads = bot_state.get_user_download_count(user_data.user_id)
+    
+    # Numeric fields, converted to Persian digits in one pass if needed
+    numbers = {
+        "join_date": user_data.created_at.strftime("%Y/%m/%d"),
+        "total_downloads": str(user_data.total_downloads),
+        "successful": str(user_data.successful_downloads),
+        "failed": str(user_data.failed_downloads),
+        "success_rate": f"{user_data.success_rate:.1f}%",
+        "daily_used": str(user_data.daily_downloads_today),
+        "daily_limit": str(daily_limit),
+        "concurrent_used": str(active_downloads),
+        "concurrent_limit": str(concurrent_limit),
+    }
     if lang_code == "fa":
-        join_date = to_persian_digits(user_data.created_at.strftime("%Y/%m/%d"))
-        total_downloads = to_persian_digits(str(user_data.total_downloads))
-        successful = to_persian_digits(str(user_data.successful_downloads))
-        failed = to_persian_digits(str(user_data.failed_downloads))
-        success_rate = to_persian_digits(f"{user_data.success_rate:.1f}%")
-        today_size = format_size_localized(0, "fa")  # TODO: Calculate
-        month_size = format_size_localized(0, "fa")
-        total_size = format_size_localized(user_data.total_size, "fa")
-        daily_used = to_persian_digits(str(user_data.daily_downloads))
-        daily_limit_str = to_persian_digits(str(daily_limit))
-        concurrent_used = to_persian_digits(str(active_downloads))
-        concurrent_limit_str = to_persian_digits(str(concurrent_limit))
+        converted = to_persian_digits("\x1f".join(numbers.values())).split("\x1f")
+        numbers = dict(zip(numbers, converted))
+        size = partial(format_size_localized, lang_code="fa")
     else:
-        join_date = user_data.created_at.strftime("%Y/%m/%d")
-        total_downloads = str(user_data.total_downloads)
-        successful = str(user_data.successful_downloads)
-        failed = str(user_data.failed_downloads)
-        success_rate = f"{user_data.success_rate:.1f}%"
-        today_size = format_file_size(0)
-        month_size = format_file_size(0)
-        total_size = format_file_size(user_data.total_size)
-        daily_used = str(user_data.daily_downloads)
-        daily_limit_str = str(daily_limit)
-        concurrent_used = str(active_downloads)
-        concurrent_limit_str = str(concurrent_limit)
+        size = format_file_size
     
     await message.reply_text(
         get_text(
@@ -2307,21 +3364,12 @@ async def stats_command(client: Client, message: Message):
             lang_code=lang_code,
             user_id=user_data.user_id,
             name=escape_html(user_data.full_name),
-            join_date=join_date,
             status=status,
-            total_downloads=total_downloads,
-            successful=successful,
-            failed=failed,
-            success_rate=success_rate,
-            today_size=today_size,
-            month_size=month_size,
-            total_size=total_size,
-            daily_used=daily_used,
-            daily_limit=daily_limit_str,
-            concurrent_used=concurrent_used,
-            concurrent_limit=concurrent_limit_str
-        ),
-        parse_mode=enums.ParseMode.HTML
+            today_size=size(0),  # TODO: Calculate
+            month_size=size(0),
+            total_size=size(user_data.total_size),
+            **numbers
+        )
     )
 
 
@@ -2338,44 +3386,34 @@ async def history_command(client: Client, message: Message):
     
     if not history:
         await message.reply_text(
-            get_text("history.empty", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("history.empty", lang_code=lang_code)
         )
         return
     
-    # Format history list
-    history_items = []
-    for item in history:
-        title = truncate_text(item['title'] or "Unknown", 30)
-        date = item['created_at'][:10] if item['created_at'] else "N/A"
-        size = format_size_localized(item['file_size'] or 0, lang_code)
-        
-        if item['status'] == 'completed':
-            status = get_text("history.status_completed", lang_code=lang_code)
-        else:
-            status = get_text("history.status_failed", lang_code=lang_code)
-        
-        history_items.append(
-            get_text(
-                "history.item",
-                lang_code=lang_code,
-                title=escape_html(title),
-                date=date,
-                size=size,
-                status=status
-            )
-        )
+    # Format history list (templates are fetched once, outside the loop)
+    item_template = get_template("history.item", lang_code)
+    status_completed = get_template("history.status_completed", lang_code)
+    status_failed = get_template("history.status_failed", lang_code)
+    
+    history_list = "\n\n".join(
+        item_template.format_map({
+            "title": escape_html(truncate_text(item['title'] or "Unknown", 30)),
+            "date": item['created_at'][:10] if item['created_at'] else "N/A",
+            "size": format_size_localized(item['file_size'] or 0, lang_code),
+            "status": status_completed if item['status'] == 'completed' else status_failed,
+        })
+        for item in history
+    )
     
     await message.reply_text(
         get_text(
             "history.title",
             lang_code=lang_code,
-            history_list="\n\n".join(history_items),
+            history_list=history_list,
             showing=len(history),
             total=user_data.total_downloads,
             pagination=""
-        ),
-        parse_mode=enums.ParseMode.HTML
+        )
     )
 
 
@@ -2384,19 +3422,17 @@ async def history_command(client: Client, message: Message):
 async def cancel_command(client: Client, message: Message):
     """Handle /cancel command."""
     user_id = message.from_user.id
-    lang_code = get_user_language(user_id)
+    lang_code = get_request_language(message)
     
     cancelled = await bot_state.cancel_user_downloads(user_id)
     
     if cancelled > 0:
         await message.reply_text(
-            get_text("download.cancelled", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("download.cancelled", lang_code=lang_code)
         )
     else:
         await message.reply_text(
-            get_text("common.none", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("common.none", lang_code=lang_code)
         )
 
 
@@ -2404,64 +3440,54 @@ async def cancel_command(client: Client, message: Message):
 # ADMIN COMMANDS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Seconds a system usage reading is reused across admin panel refreshes
+SYSTEM_USAGE_TTL = 5
+
+
+def _read_system_usage() -> Tuple[str, str, str]:
+    """Read CPU, RAM and disk usage percentages ("N/A" if unavailable)."""
+    try:
+        import psutil
+        return (
+            f"{psutil.cpu_percent()}%",
+            f"{psutil.virtual_memory().percent}%",
+            f"{psutil.disk_usage('/').percent}%",
+        )
+    except Exception:
+        return "N/A", "N/A", "N/A"
+
+
+async def get_system_usage() -> Tuple[str, str, str]:
+    """Get system usage, read on a worker thread and cached briefly."""
+    usage = bot_state.get_cached("system_usage", ttl=SYSTEM_USAGE_TTL)
+    if usage is None:
+        usage = await asyncio.to_thread(_read_system_usage)
+        bot_state.set_cached("system_usage", usage)
+    return usage
+
+
 @app.on_message(filters.command("adminpanel") & filters.private)
 @admin_only
 async def admin_panel_command(client: Client, message: Message):
     """Handle /adminpanel command."""
-    lang_code = get_user_language(message.from_user.id)
-    
-    # Gather statistics
-    total_users = await db.get_total_users()
-    active_users = await db.get_active_users(24)
-    vip_users = await db.get_vip_users()
-    banned_users = await db.get_banned_users()
+    lang_code = get_request_language(message)
+    
+    # Gather statistics (system stats are read on a worker thread meanwhile)
+    total_users, active_users, vip_users, banned_users, system_usage = await asyncio.gather(
+        db.get_total_users(),
+        db.get_active_users(24),
+        db.get_vip_users(),
+        db.get_banned_users(),
+        get_system_usage()
+    )
+    cpu_usage, ram_usage, disk_usage = system_usage
     
     bot_stats = bot_state.get_stats()
     
-    # System stats
-    try:
-        import psutil
-        cpu_usage = f"{psutil.cpu_percent()}%"
-        ram = psutil.virtual_memory()
-        ram_usage = f"{ram.percent}%"
-        disk = psutil.disk_usage('/')
-        disk_usage = f"{disk.percent}%"
-    except ImportError:
-        cpu_usage = "N/A"
-        ram_usage = "N/A"
-        disk_usage = "N/A"
-    
     # Top platforms (placeholder)
     top_platforms = "• YouTube\n• Instagram\n• TikTok"
     
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton(
-                get_text("buttons.broadcast", lang_code=lang_code),
-                callback_data="admin:broadcast"
-            ),
-            InlineKeyboardButton(
-                get_text("buttons.users", lang_code=lang_code),
-                callback_data="admin:users"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                get_text("buttons.cleanup", lang_code=lang_code),
-                callback_data="admin:cleanup"
-            ),
-            InlineKeyboardButton(
-                get_text("buttons.refresh", lang_code=lang_code),
-                callback_data="admin:refresh"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                get_text("buttons.back", lang_code=lang_code),
-                callback_data="menu:main"
-            )
-        ]
-    ])
+    keyboard = create_admin_panel_keyboard(lang_code)
     
     await message.reply_text(
         get_text(
@@ -2481,8 +3507,7 @@ async def admin_panel_command(client: Client, message: Message):
             disk_usage=disk_usage,
             top_platforms=top_platforms
         ),
-        reply_markup=keyboard,
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=keyboard
     )
 
 
@@ -2490,23 +3515,23 @@ async def admin_panel_command(client: Client, message: Message):
 @owner_only
 async def broadcast_command(client: Client, message: Message):
     """Handle /broadcast command."""
-    lang_code = get_user_language(message.from_user.id)
+    lang_code = get_request_language(message)
     
     # Check if message has text after command
-    if len(message.text.split(None, 1)) < 2:
+    parts = message.text.split(None, 1)
+    if len(parts) < 2:
         user_count = await db.get_total_users()
         await message.reply_text(
             get_text(
                 "admin.broadcast_prompt",
                 lang_code=lang_code,
                 count=user_count
-            ),
-            parse_mode=enums.ParseMode.HTML
+            )
         )
         return
     
-    broadcast_text = message.text.split(None, 1)[1]
-    user_ids = await db.get_all_user_ids()
+    broadcast_text = parts[1]
+    user_count = await db.get_broadcast_user_count()
     
     # Confirm broadcast
     keyboard = InlineKeyboardMarkup([
@@ -2523,17 +3548,16 @@ async def broadcast_command(client: Client, message: Message):
     ])
     
     # Store broadcast text temporarily
-    await bot_state.set_cached(f"broadcast:{message.from_user.id}", broadcast_text)
+    bot_state.set_cached(f"broadcast:{message.from_user.id}", broadcast_text)
     
     await message.reply_text(
         get_text(
             "admin.broadcast_confirm",
             lang_code=lang_code,
-            count=len(user_ids),
+            count=user_count,
             message=escape_html(truncate_text(broadcast_text, 200))
         ),
-        reply_markup=keyboard,
-        parse_mode=enums.ParseMode.HTML
+        reply_markup=keyboard
     )
 
 
@@ -2541,24 +3565,25 @@ async def broadcast_command(client: Client, message: Message):
 @admin_only
 async def ban_command(client: Client, message: Message):
     """Handle /ban command."""
-    lang_code = get_user_language(message.from_user.id)
+    lang_code = get_request_language(message)
     
-    args = message.text.split()[1:]
+    # The reason is kept as typed, after the user ID
+    args = message.text.split(maxsplit=2)[1:]
     if not args:
         await message.reply_text(
-            "Usage: /ban <user_id> [reason]",
-            parse_mode=enums.ParseMode.HTML
+            "Usage: /ban <user_id> [reason]"
         )
         return
     
     try:
         target_id = int(args[0])
-        reason = " ".join(args[1:]) if len(args) > 1 else "No reason provided"
+        reason = args[1] if len(args) > 1 else "No reason provided"
         
         await db.create_or_update_user(
             user_id=target_id,
             is_banned=True,
-            ban_reason=reason
+            ban_reason=reason,
+            return_user=False
         )
         
         await message.reply_text(
@@ -2567,13 +3592,11 @@ async def ban_command(client: Client, message: Message):
                 lang_code=lang_code,
                 user_id=target_id,
                 reason=reason
-            ),
-            parse_mode=enums.ParseMode.HTML
+            )
         )
     except ValueError:
         await message.reply_text(
-            get_text("admin.user_not_found", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("admin.user_not_found", lang_code=lang_code)
         )
 
 
@@ -2581,13 +3604,12 @@ async def ban_command(client: Client, message: Message):
 @admin_only
 async def unban_command(client: Client, message: Message):
     """Handle /unban command."""
-    lang_code = get_user_language(message.from_user.id)
+    lang_code = get_request_language(message)
     
-    args = message.text.split()[1:]
+    args = message.text.split(maxsplit=2)[1:]
     if not args:
         await message.reply_text(
-            "Usage: /unban <user_id>",
-            parse_mode=enums.ParseMode.HTML
+            "Usage: /unban <user_id>"
         )
         return
     
@@ -2597,7 +3619,8 @@ async def unban_command(client: Client, message: Message):
         await db.create_or_update_user(
             user_id=target_id,
             is_banned=False,
-            ban_reason=""
+            ban_reason="",
+            return_user=False
         )
         
         await message.reply_text(
@@ -2605,13 +3628,11 @@ async def unban_command(client: Client, message: Message):
                 "admin.unban_success",
                 lang_code=lang_code,
                 user_id=target_id
-            ),
-            parse_mode=enums.ParseMode.HTML
+            )
         )
     except ValueError:
         await message.reply_text(
-            get_text("admin.user_not_found", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("admin.user_not_found", lang_code=lang_code)
         )
 
 
@@ -2619,13 +3640,12 @@ async def unban_command(client: Client, message: Message):
 @owner_only
 async def set_vip_command(client: Client, message: Message):
     """Handle /setvip command."""
-    lang_code = get_user_language(message.from_user.id)
+    lang_code = get_request_language(message)
     
     args = message.text.split()[1:]
     if not args:
         await message.reply_text(
-            "Usage: /setvip <user_id> [days=30]",
-            parse_mode=enums.ParseMode.HTML
+            "Usage: /setvip <user_id> [days=30]"
         )
         return
     
@@ -2637,7 +3657,8 @@ async def set_vip_command(client: Client, message: Message):
         await db.create_or_update_user(
             user_id=target_id,
             is_vip=True,
-            vip_expiry=expiry
+            vip_expiry=expiry,
+            return_user=False
         )
         
         await message.reply_text(
@@ -2646,13 +3667,11 @@ async def set_vip_command(client: Client, message: Message):
                 lang_code=lang_code,
                 user_id=target_id,
                 expiry=expiry.strftime("%Y-%m-%d")
-            ),
-            parse_mode=enums.ParseMode.HTML
+            )
         )
     except ValueError:
         await message.reply_text(
-            get_text("admin.user_not_found", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("admin.user_not_found", lang_code=lang_code)
         )
 
 
@@ -2660,11 +3679,10 @@ async def set_vip_command(client: Client, message: Message):
 @admin_only
 async def cleanup_command(client: Client, message: Message):
     """Handle /cleanup command."""
-    lang_code = get_user_language(message.from_user.id)
+    lang_code = get_request_language(message)
     
     await message.reply_text(
-        get_text("admin.cleanup_started", lang_code=lang_code),
-        parse_mode=enums.ParseMode.HTML
+        get_text("admin.cleanup_started", lang_code=lang_code)
     )
     
     files_deleted, bytes_freed = await cleanup_temp_files(max_age_hours=1)
@@ -2675,8 +3693,7 @@ async def cleanup_command(client: Client, message: Message):
             lang_code=lang_code,
             files=files_deleted,
             size=format_size_localized(bytes_freed, lang_code)
-        ),
-        parse_mode=enums.ParseMode.HTML
+        )
     )
 
 
@@ -2684,6 +3701,43 @@ async def cleanup_command(client: Client, message: Message):
 # DOCUMENT HANDLER (Cookie Upload)
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Domains that identify a cookie file's platform, in priority order
+COOKIE_PLATFORM_DOMAINS = {
+    b"youtube.com": "youtube",
+    b"google.com": "youtube",
+    b"instagram.com": "instagram",
+    b"twitter.com": "twitter",
+    b"x.com": "twitter",
+    b"facebook.com": "facebook",
+    b"tiktok.com": "tiktok",
+}
+COOKIE_PLATFORMS = tuple(dict.fromkeys(COOKIE_PLATFORM_DOMAINS.values()))
+COOKIE_DOMAIN_PATTERN = re.compile(b"|".join(map(re.escape, COOKIE_PLATFORM_DOMAINS)), re.IGNORECASE)
+
+# Cookie file format markers
+NETSCAPE_COOKIE_HEADER = b"# Netscape HTTP Cookie File"
+JSON_COOKIE_START = re.compile(rb"\s*\{")
+
+
+def detect_cookie_platform(content: bytes) -> str:
+    """
+    Detect which platform a cookie file belongs to from its raw bytes.
+    
+    Domains are matched case-insensitively, so nothing is lowercased.
+    When several platforms appear, the first in COOKIE_PLATFORMS wins.
+    
+    Args:
+        content: Cookie file contents
+        
+    Returns:
+        Platform name, or "generic" if no known domain was seen
+    """
+    found = {
+        COOKIE_PLATFORM_DOMAINS[m.group(0).lower()] for m in COOKIE_DOMAIN_PATTERN.finditer(content)
+    }
+    return next((plat for plat in COOKIE_PLATFORMS if plat in found), "generic")
+
+
 @app.on_message(filters.document & filters.private)
 @maintenance_check
 @check_banned
@@ -2702,67 +3756,46 @@ async def document_handler(client: Client, message: Message):
     # Check file size
     if document.file_size > config.security.max_cookie_size:
         await message.reply_text(
-            get_text("errors.file_too_large", lang_code=lang_code, size="1 MB"),
-            parse_mode=enums.ParseMode.HTML
+            get_text("errors.file_too_large", lang_code=lang_code, size="1 MB")
         )
         return
     
     # Download the file
     status_msg = await message.reply_text(
-        get_text("cookie.uploading", lang_code=lang_code),
-        parse_mode=enums.ParseMode.HTML
+        get_text("cookie.uploading", lang_code=lang_code)
     )
     
     try:
-        # Download to temp location
-        file_path = await message.download(file_name=TEMP_DIR / f"cookie_{user_id}.txt")
-        
-        # Read and validate cookie content
-        async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            cookie_content = await f.read()
+        # Download straight into memory (cookie files are size-capped above)
+        buffer = await message.download(in_memory=True)
+        cookie_content = buffer.getvalue()
         
         # Basic validation - check for Netscape format
-        if '# Netscape HTTP Cookie File' not in cookie_content and not cookie_content.strip().startswith('{'):
+        if NETSCAPE_COOKIE_HEADER not in cookie_content and not JSON_COOKIE_START.match(cookie_content):
             await status_msg.edit_text(
-                get_text("cookie.invalid_format", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                get_text("cookie.invalid_format", lang_code=lang_code)
             )
-            Path(file_path).unlink(missing_ok=True)
             return
         
         # Detect platform from cookie content
-        platform = "generic"
-        platform_patterns = {
-            "youtube": ["youtube.com", "google.com"],
-            "instagram": ["instagram.com"],
-            "twitter": ["twitter.com", "x.com"],
-            "facebook": ["facebook.com"],
-            "tiktok": ["tiktok.com"],
-        }
-        
-        for plat, patterns in platform_patterns.items():
-            if any(p in cookie_content.lower() for p in patterns):
-                platform = plat
-                break
+        platform = detect_cookie_platform(cookie_content)
         
-        # Encrypt and save
-        encrypted = cookie_encryption.encrypt(cookie_content)
+        # Encrypt and save; cookie files are nearly always plain ASCII
+        if not cookie_content.isascii():
+            cookie_content = cookie_content.decode('utf-8', errors='ignore')
+        encrypted = await asyncio.to_thread(cookie_encryption.encrypt, cookie_content)
         await db.save_cookie(user_id, platform, encrypted)
         
-        # Clean up temp file
-        Path(file_path).unlink(missing_ok=True)
-        
         await status_msg.edit_text(
             get_text(
                 "cookie.upload_success",
                 lang_code=lang_code,
                 platform=platform,
                 date=datetime.now().strftime("%Y-%m-%d")
-            ),
-            parse_mode=enums.ParseMode.HTML
+            )
         )
         
-        logger.info(f"User {user_id} uploaded cookie for {platform}")
+        logger.info("User %s uploaded cookie for %s", user_id, platform)
         
     except Exception as e:
         logger.error(f"Error processing cookie upload: {e}")
@@ -2770,9 +3803,8 @@ async def document_handler(client: Client, message: Message):
             get_text(
                 "cookie.upload_failed",
                 lang_code=lang_code,
-                reason=str(e)
-            ),
-            parse_mode=enums.ParseMode.HTML
+                reason=describe_error(e)
+            )
         )
 
 
@@ -2780,7 +3812,11 @@ async def document_handler(client: Client, message: Message):
 # URL HANDLER (Main Download Logic)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@app.on_message(filters.text & filters.private & ~filters.command(["start", "help", "language", "cookie", "listcookies", "deletecookie", "quality", "stats", "history", "cancel", "adminpanel", "broadcast", "ban", "unban", "setvip", "cleanup"]))
+# URLs in a text message; only messages that contain one reach url_handler
+MESSAGE_URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+
+@app.on_message(filters.text & filters.private & ~filters.command(["start", "help", "language", "cookie", "listcookies", "deletecookie", "quality", "stats", "history", "cancel", "adminpanel", "broadcast", "ban", "unban", "setvip", "cleanup"]) & filters.regex(MESSAGE_URL_PATTERN))
 @maintenance_check
 @check_banned
 @rate_limit_check
@@ -2790,22 +3826,13 @@ async def url_handler(client: Client, message: Message):
     lang_code = user_data.language
     user_id = message.from_user.id
     
-    text = message.text.strip()
-    
-    # Extract URL from text
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-    urls = re.findall(url_pattern, text)
-    
-    if not urls:
-        return  # Not a URL, ignore
-    
-    url = urls[0]
+    # The regex filter only lets messages containing a URL through
+    url = message.matches[0].group(0)
     
     # Validate URL
     if not is_valid_url(url):
         await message.reply_text(
-            get_text("errors.invalid_url", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("errors.invalid_url", lang_code=lang_code)
         )
         return
     
@@ -2813,35 +3840,39 @@ async def url_handler(client: Client, message: Message):
     platform = detect_platform(url)
     platform_name = get_text(f"platforms.{platform.value}", lang_code=lang_code)
     
+    # Start extracting video info so it overlaps with the status message round trip
+    extract_task = asyncio.create_task(extract_video_info(url, user_id=user_id))
+    
     # Send processing message
-    status_msg = await message.reply_text(
-        get_text(
-            "download.extracting_with_platform",
-            lang_code=lang_code,
-            platform=platform_name
-        ),
-        parse_mode=enums.ParseMode.HTML
-    )
+    try:
+        status_msg = await message.reply_text(
+            get_text(
+                "download.extracting_with_platform",
+                lang_code=lang_code,
+                platform=platform_name
+            )
+        )
+    except Exception:
+        extract_task.cancel()
+        raise
     
     # Generate task ID
     task_id = generate_task_id()
     
     try:
-        # Extract video info
-        video_info = await extract_video_info(url, user_id=user_id)
+        # Wait for video info
+        video_info, extracted_info = await extract_task
         
         if not video_info:
             await status_msg.edit_text(
-                get_text("errors.extraction_failed", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                get_text("errors.extraction_failed", lang_code=lang_code)
             )
             return
         
         # Check for private/age-restricted content
         if video_info.is_private:
             await status_msg.edit_text(
-                get_text("errors.private_video", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                get_text("errors.private_video", lang_code=lang_code)
             )
             return
         
@@ -2850,8 +3881,7 @@ async def url_handler(client: Client, message: Message):
             cookie = await db.get_cookie(user_id, platform.value)
             if not cookie:
                 await status_msg.edit_text(
-                    get_text("errors.age_restricted", lang_code=lang_code),
-                    parse_mode=enums.ParseMode.HTML
+                    get_text("errors.age_restricted", lang_code=lang_code)
                 )
                 return
         
@@ -2863,6 +3893,7 @@ async def url_handler(client: Client, message: Message):
             message_id=status_msg.id,
             url=url,
             video_info=video_info,
+            extracted_info=extracted_info,
             status=DownloadStatus.PENDING
         )
         await bot_state.add_download(task)
@@ -2882,26 +3913,24 @@ async def url_handler(client: Client, message: Message):
             get_text(
                 "download.select_quality",
                 lang_code=lang_code,
-                title=escape_html(truncate_text(video_info.title, 100)),
-                uploader=escape_html(video_info.uploader or "N/A"),
+                title=video_info.title_html,
+                uploader=video_info.uploader_html,
                 duration=duration,
                 views=views
             ),
-            reply_markup=keyboard,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=keyboard
         )
         
     except Exception as e:
         logger.error(f"Error processing URL {url}: {e}")
-        logger.error(traceback.format_exc())
+        logger.debug("Traceback:", exc_info=True)
         
         await status_msg.edit_text(
             get_text(
                 "errors.generic",
                 lang_code=lang_code,
-                message=str(e)[:100]
-            ),
-            parse_mode=enums.ParseMode.HTML
+                message=describe_error(e)
+            )
         )
 
 
@@ -2917,48 +3946,17 @@ async def callback_handler(client: Client, callback: CallbackQuery):
     data = callback.data
     
     try:
-        # Menu callbacks
-        if data.startswith("menu:"):
-            await handle_menu_callback(client, callback, data, lang_code)
-        
-        # Language callbacks
-        elif data.startswith("lang:"):
-            await handle_language_callback(client, callback, data, lang_code)
-        
-        # Help callbacks
-        elif data.startswith("help:"):
-            await handle_help_callback(client, callback, data, lang_code)
-        
-        # Download callbacks
-        elif data.startswith("dl:"):
-            await handle_download_callback(client, callback, data, lang_code)
-        
-        # Cancel callbacks
-        elif data.startswith("cancel:"):
-            await handle_cancel_callback(client, callback, data, lang_code)
-        
-        # Quality setting callbacks
-        elif data.startswith("setquality:"):
-            await handle_quality_callback(client, callback, data, lang_code)
-        
-        # Cookie delete callbacks
-        elif data.startswith("delcookie:"):
-            await handle_cookie_delete_callback(client, callback, data, lang_code)
-        
-        # Admin callbacks
-        elif data.startswith("admin:"):
-            await handle_admin_callback(client, callback, data, lang_code)
-        
-        # Broadcast callbacks
-        elif data.startswith("broadcast:"):
-            await handle_broadcast_callback(client, callback, data, lang_code)
-        
+        # Dispatch on the prefix; handlers get the rest of the data
+        prefix, _, payload = data.partition(":")
+        handler = CALLBACK_HANDLERS.get(prefix)
+        if handler:
+            await handler(client, callback, payload, lang_code)
         else:
             await callback.answer("Unknown action", show_alert=True)
             
     except Exception as e:
         logger.error(f"Callback error: {e}")
-        logger.error(traceback.format_exc())
+        logger.debug("Traceback:", exc_info=True)
         await callback.answer(
             get_text("common.error", lang_code=lang_code),
             show_alert=True
@@ -2967,128 +3965,52 @@ async def callback_handler(client: Client, callback: CallbackQuery):
 
 async def handle_menu_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle menu navigation callbacks."""
-    action = data.split(":")[1]
+    action = data
     
     if action == "main":
         # Back to main menu
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton(
-                    get_text("buttons.help", lang_code=lang_code),
-                    callback_data="menu:help"
-                ),
-                InlineKeyboardButton(
-                    get_text("buttons.language", lang_code=lang_code),
-                    callback_data="menu:language"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    get_text("buttons.stats", lang_code=lang_code),
-                    callback_data="menu:stats"
-                ),
-                InlineKeyboardButton(
-                    get_text("buttons.history", lang_code=lang_code),
-                    callback_data="menu:history"
-                )
-            ]
-        ])
-        
         await callback.message.edit_text(
             get_text("start.welcome", lang_code=lang_code),
-            reply_markup=keyboard,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_main_menu_keyboard(lang_code, is_admin(callback.from_user.id, config))
         )
     
     elif action == "help":
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("🍪 Cookie", callback_data="help:cookie"),
-                InlineKeyboardButton("📊 Quality", callback_data="help:quality")
-            ],
-            [
-                InlineKeyboardButton("🌐 Platforms", callback_data="help:platforms")
-            ],
-            [
-                InlineKeyboardButton(
-                    get_text("buttons.back", lang_code=lang_code),
-                    callback_data="menu:main"
-                )
-            ]
-        ])
-        
         await callback.message.edit_text(
             get_text("help.main", lang_code=lang_code),
-            reply_markup=keyboard,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_help_keyboard(lang_code)
         )
     
     elif action == "language":
         await callback.message.edit_text(
             get_text("language.select", lang_code=lang_code),
-            reply_markup=create_language_keyboard(),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_language_keyboard()
         )
     
     elif action == "stats":
-        await callback.answer()
         # Trigger stats command logic
         user_data = await db.get_user(callback.from_user.id)
         if user_data:
             # Similar to stats_command
             await callback.answer(get_text("common.loading", lang_code=lang_code))
+            return
     
     elif action == "history":
-        await callback.answer()
         # Trigger history command logic
+        pass
     
     elif action == "cookie":
         await callback.message.edit_text(
             get_text("help.cookie_guide", lang_code=lang_code),
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(
-                    get_text("buttons.back", lang_code=lang_code),
-                    callback_data="menu:main"
-                )
-            ]]),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_back_keyboard(lang_code)
         )
     
     elif action == "quality":
         user_data = await db.get_user(callback.from_user.id)
         current_quality = user_data.default_quality if user_data else "1080"
         
-        qualities = [
-            ("2160", "🔵 4K"),
-            ("1440", "🟣 2K"),
-            ("1080", "🟢 1080p"),
-            ("720", "🟡 720p"),
-            ("480", "🟠 480p"),
-        ]
-        
-        buttons = []
-        row = []
-        for quality, label in qualities:
-            if quality == current_quality:
-                label = f"✓ {label}"
-            row.append(InlineKeyboardButton(label, callback_data=f"setquality:{quality}"))
-            if len(row) == 3:
-                buttons.append(row)
-                row = []
-        if row:
-            buttons.append(row)
-        
-        buttons.append([
-            InlineKeyboardButton(
-                get_text("buttons.back", lang_code=lang_code),
-                callback_data="menu:main"
-            )
-        ])
-        
         await callback.message.edit_text(
             get_text("quality.set_default", lang_code=lang_code, quality=current_quality),
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_default_quality_keyboard(lang_code, current_quality)
         )
     
     elif action == "admin":
@@ -3097,30 +4019,24 @@ async def handle_menu_callback(client: Client, callback: CallbackQuery, data: st
             return
         
         # Show admin panel
-        await callback.answer()
     
+    # Every branch that has not answered already is answered exactly once here
     await callback.answer()
 
 
 async def handle_language_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle language selection callbacks."""
-    new_lang = data.split(":")[1]
+    new_lang = data
     user_id = callback.from_user.id
     
     if new_lang in SUPPORTED_LANGUAGES:
         # Update user language
-        await db.create_or_update_user(user_id=user_id, language=new_lang)
+        await db.create_or_update_user(user_id=user_id, language=new_lang, return_user=False)
         set_user_language(user_id, new_lang)
         
         await callback.message.edit_text(
             get_text("language.changed", lang_code=new_lang),
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(
-                    get_text("buttons.back", lang_code=new_lang),
-                    callback_data="menu:main"
-                )
-            ]]),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_back_keyboard(new_lang)
         )
         
         await callback.answer(get_text("common.success", lang_code=new_lang))
@@ -3133,34 +4049,26 @@ async def handle_language_callback(client: Client, callback: CallbackQuery, data
 
 async def handle_help_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle help section callbacks."""
-    section = data.split(":")[1]
+    section = data
     
-    back_button = InlineKeyboardMarkup([[
-        InlineKeyboardButton(
-            get_text("buttons.back", lang_code=lang_code),
-            callback_data="menu:help"
-        )
-    ]])
+    back_button = create_back_keyboard(lang_code, "menu:help")
     
     if section == "cookie":
         await callback.message.edit_text(
             get_text("help.cookie_guide", lang_code=lang_code),
-            reply_markup=back_button,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=back_button
         )
     
     elif section == "quality":
         await callback.message.edit_text(
             get_text("help.quality_guide", lang_code=lang_code),
-            reply_markup=back_button,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=back_button
         )
     
     elif section == "platforms":
         await callback.message.edit_text(
             get_text("help.platforms", lang_code=lang_code),
-            reply_markup=back_button,
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=back_button
         )
     
     await callback.answer()
@@ -3168,14 +4076,12 @@ async def handle_help_callback(client: Client, callback: CallbackQuery, data: st
 
 async def handle_download_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle download quality selection callbacks."""
-    parts = data.split(":")
-    task_id = parts[1]
-    quality = parts[2]
+    task_id, _, quality = data.partition(":")
     
     user_id = callback.from_user.id
     
     # Get download task
-    task = await bot_state.get_download(task_id)
+    task = bot_state.get_download(task_id)
     
     if not task:
         await callback.answer(
@@ -3207,8 +4113,7 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
     
     # Update message to show starting
     await callback.message.edit_text(
-        get_text("download.starting", lang_code=lang_code),
-        parse_mode=enums.ParseMode.HTML
+        get_text("download.starting", lang_code=lang_code)
     )
     
     try:
@@ -3226,7 +4131,8 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
             quality=quality if not audio_only else "best",
             user_id=user_id,
             progress_tracker=progress_tracker,
-            audio_only=audio_only
+            audio_only=audio_only,
+            info=task.extracted_info
         )
         
         if task.cancelled:
@@ -3252,22 +4158,19 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
                 get_text(error_key, lang_code=lang_code, reason=error, size="2 GB")
             )
             
-            # Update stats
-            await db.increment_download_count(user_id, success=False)
-            await bot_state.increment_stats(success=False)
-            
-            # Add to history
-            await db.add_download_history(
+            # Update stats and history
+            await db.record_download(
                 user_id=user_id,
+                success=False,
                 url=task.url,
                 title=task.video_info.title,
                 platform=task.video_info.platform.value,
                 quality=quality,
                 file_size=0,
                 duration=task.video_info.duration,
-                status="failed",
                 error_message=error
             )
+            await bot_state.increment_stats(success=False)
             
             await bot_state.remove_download(task_id)
             return
@@ -3275,12 +4178,14 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
         # Upload to Telegram
         await progress_tracker.set_status(DownloadStatus.UPLOADING)
         
+        file_size = os.stat(file_path).st_size
         upload_success = await send_video_to_user(
             client=client,
             chat_id=task.chat_id,
             file_path=file_path,
             video_info=task.video_info,
-            progress_tracker=progress_tracker
+            progress_tracker=progress_tracker,
+            file_size=file_size
         )
         
         if upload_success:
@@ -3290,24 +4195,20 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
             except:
                 pass
             
-            # Update stats
-            file_size = file_path.stat().st_size
-            await db.increment_download_count(user_id, success=True, size=file_size)
-            await bot_state.increment_stats(success=True)
-            
-            # Add to history
-            await db.add_download_history(
+            # Update stats and history
+            await db.record_download(
                 user_id=user_id,
+                success=True,
                 url=task.url,
                 title=task.video_info.title,
                 platform=task.video_info.platform.value,
                 quality=quality,
                 file_size=file_size,
-                duration=task.video_info.duration,
-                status="completed"
+                duration=task.video_info.duration
             )
+            await bot_state.increment_stats(success=True)
             
-            logger.info(f"Download completed for user {user_id}: {task.video_info.title}")
+            logger.info("Download completed for user %s: %s", user_id, task.video_info.title)
         else:
             await progress_tracker.complete(
                 get_text("errors.upload_failed", lang_code=lang_code)
@@ -3316,11 +4217,8 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
             await bot_state.increment_stats(success=False)
         
         # Cleanup
-        if file_path and file_path.exists():
-            try:
-                file_path.unlink()
-            except:
-                pass
+        with suppress(OSError):
+            await aiofiles.os.remove(file_path)
         
         await bot_state.remove_download(task_id)
         
@@ -3332,10 +4230,10 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
         
     except Exception as e:
         logger.error(f"Download error: {e}")
-        logger.error(traceback.format_exc())
+        logger.debug("Traceback:", exc_info=True)
         
         await progress_tracker.complete(
-            get_text("errors.generic", lang_code=lang_code, message=str(e)[:100])
+            get_text("errors.generic", lang_code=lang_code, message=describe_error(e))
         )
         
         await db.increment_download_count(user_id, success=False)
@@ -3345,18 +4243,17 @@ async def handle_download_callback(client: Client, callback: CallbackQuery, data
 
 async def handle_cancel_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle download cancellation callbacks."""
-    task_id = data.split(":")[1]
+    task_id = data
     user_id = callback.from_user.id
     
-    task = await bot_state.get_download(task_id)
+    task = bot_state.get_download(task_id)
     
     if task and task.user_id == user_id:
         task.cancelled = True
         await bot_state.remove_download(task_id)
         
         await callback.message.edit_text(
-            get_text("download.cancelled", lang_code=lang_code),
-            parse_mode=enums.ParseMode.HTML
+            get_text("download.cancelled", lang_code=lang_code)
         )
         
         await callback.answer(get_text("common.cancelled", lang_code=lang_code))
@@ -3366,31 +4263,28 @@ async def handle_cancel_callback(client: Client, callback: CallbackQuery, data:
 
 async def handle_quality_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle default quality setting callbacks."""
-    quality = data.split(":")[1]
+    quality = data
     user_id = callback.from_user.id
     
-    await db.create_or_update_user(user_id=user_id, default_quality=quality)
+    await db.create_or_update_user(user_id=user_id, default_quality=quality, return_user=False)
     
     await callback.answer(
         get_text("quality.default_changed", lang_code=lang_code, quality=quality)
     )
     
-    # Refresh the keyboard
-    await callback.message.edit_text(
-        get_text("quality.set_default", lang_code=lang_code, quality=quality),
-        reply_markup=InlineKeyboardMarkup([[
-            InlineKeyboardButton(
-                get_text("buttons.back", lang_code=lang_code),
-                callback_data="menu:main"
-            )
-        ]]),
-        parse_mode=enums.ParseMode.HTML
-    )
+    # Refresh the keyboard (unchanged if the current default was tapped again)
+    try:
+        await callback.message.edit_text(
+            get_text("quality.set_default", lang_code=lang_code, quality=quality),
+            reply_markup=create_default_quality_keyboard(lang_code, quality)
+        )
+    except MessageNotModified:
+        pass
 
 
 async def handle_cookie_delete_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
     """Handle cookie deletion callbacks."""
-    platform = data.split(":")[1]
+    platform = data
     user_id = callback.from_user.id
     
     success = await db.delete_cookie(user_id, platform)
@@ -3400,8 +4294,7 @@ async def handle_cookie_delete_callback(client: Client, callback: CallbackQuery,
             get_text("cookie.delete_success", lang_code=lang_code, platform=platform)
         )
         await callback.message.edit_text(
-            get_text("cookie.delete_success", lang_code=lang_code, platform=platform),
-            parse_mode=enums.ParseMode.HTML
+            get_text("cookie.delete_success", lang_code=lang_code, platform=platform)
         )
     else:
         await callback.answer(
@@ -3416,7 +4309,7 @@ async def handle_admin_callback(client: Client, callback: CallbackQuery, data: s
         await callback.answer(get_text("errors.not_admin", lang_code=lang_code), show_alert=True)
         return
     
-    action = data.split(":")[1]
+    action = data
     
     if action == "cleanup":
         await callback.answer(get_text("admin.cleanup_started", lang_code=lang_code))
@@ -3428,13 +4321,7 @@ async def handle_admin_callback(client: Client, callback: CallbackQuery, data: s
                 files=files,
                 size=format_size_localized(size, lang_code)
             ),
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(
-                    get_text("buttons.back", lang_code=lang_code),
-                    callback_data="menu:admin"
-                )
-            ]]),
-            parse_mode=enums.ParseMode.HTML
+            reply_markup=create_back_keyboard(lang_code, "menu:admin")
         )
     
     elif action == "refresh":
@@ -3450,9 +4337,190 @@ async def handle_admin_callback(client: Client, callback: CallbackQuery, data: s
                     get_text("buttons.cancel", lang_code=lang_code),
                     callback_data="menu:admin"
                 )
-            ]]),
-            parse_mode=enums.ParseMode.HTML
+            ]])
+        )
+
+
+# Broadcast sends in flight at once, unless a FloodWait throttles them
+BROADCAST_CONCURRENCY = 30
+
+# Recipients buffered between the user ID pages and the send workers
+BROADCAST_QUEUE_SIZE = 2000
+
+# Broadcast messages per second, just under Telegram's global ~30 msg/s
+BROADCAST_RATE = 28
+
+# Seconds between broadcast progress edits (Telegram allows about one edit
+# per second per chat, and sends finish far faster than that)
+BROADCAST_PROGRESS_INTERVAL = 3.0
+
+
+class AdmissionController:
+    """
+    Caps concurrent broadcast sends with a limit that can shrink at runtime.
+    
+    Unlike a semaphore, the limit is a plain value re-checked under a
+    condition on every wake-up. throttle() can therefore lower it while
+    sends are in flight: running sends finish, and waiting ones hold back
+    until the limit is restored.
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._current_limit = limit
+        self._active = 0
+        self._throttled_until = 0.0
+        self._condition = asyncio.Condition()
+    
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self._current_limit)
+            self._active += 1
+    
+    async def release(self) -> None:
+        """Give a slot back."""
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify()
+    
+    async def __aenter__(self) -> "AdmissionController":
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.release()
+    
+    async def throttle(self, seconds: float, limit: int = 1) -> None:
+        """
+        Lower the limit for a while, e.g. for the length of a FloodWait.
+        
+        Returns once the window has passed; overlapping windows extend it.
+        
+        Args:
+            seconds: How long to keep the lower limit
+            limit: Concurrency allowed meanwhile
+        """
+        loop = asyncio.get_running_loop()
+        async with self._condition:
+            self._current_limit = min(self._current_limit, limit)
+            self._throttled_until = max(self._throttled_until, loop.time() + seconds)
+        
+        await asyncio.sleep(seconds)
+        
+        async with self._condition:
+            if loop.time() >= self._throttled_until:
+                self._current_limit = self.limit
+                self._condition.notify_all()
+
+
+class TokenBucket:
+    """
+    Async token bucket rate limiter.
+    
+    Every acquire() takes one token; tokens refill continuously at `rate`
+    per second up to `capacity`, so callers are spread out before they
+    can trigger a FloodWait rather than after.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._slow_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+    
+    def slow_down(self, seconds: float, factor: float = 0.5) -> None:
+        """
+        Reduce the rate for a while, e.g. after a FloodWait slipped through.
+        
+        Args:
+            seconds: How long to keep the reduced rate
+            factor: Fraction of the base rate to allow meanwhile
+        """
+        self._refill()
+        self.rate = min(self.rate, self.base_rate * factor)
+        self._slow_until = max(self._slow_until, time.monotonic() + seconds)
+        asyncio.get_running_loop().call_later(seconds, self._restore_rate)
+    
+    def _restore_rate(self) -> None:
+        # A later slow_down() may have extended the window
+        if time.monotonic() >= self._slow_until:
+            self._refill()
+            self.rate = self.base_rate
+
+
+# Shared by all broadcasts, since Telegram's limit is per bot
+broadcast_rate_limiter = TokenBucket(rate=BROADCAST_RATE, capacity=BROADCAST_RATE)
+
+
+async def _send_parsed_message(client: Client, user_id: int, parsed: Dict[str, Any]) -> None:
+    """Send already-parsed text with the raw API, skipping send_message's parse and result building."""
+    await client.invoke(
+        raw.functions.messages.SendMessage(
+            peer=await client.resolve_peer(user_id),
+            message=parsed["message"],
+            entities=parsed["entities"] or None,
+            random_id=client.rnd_id()
         )
+    )
+
+
+async def send_broadcast_message(
+    client: Client,
+    user_id: int,
+    parsed: Dict[str, Any],
+    admission: AdmissionController
+) -> bool:
+    """
+    Send one broadcast message, retrying once after a FloodWait.
+    
+    Each attempt waits for a token from broadcast_rate_limiter. A FloodWait
+    slows the limiter down and throttles the whole broadcast through the
+    admission controller, not just this send.
+    
+    Args:
+        client: Pyrogram client
+        user_id: Recipient
+        parsed: The broadcast text as returned by client.parser.parse
+        admission: The broadcast's admission controller
+        
+    Returns:
+        True if the message was delivered
+    """
+    try:
+        await broadcast_rate_limiter.acquire()
+        await _send_parsed_message(client, user_id, parsed)
+        return True
+    except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid):
+        return False
+    except FloodWait as e:
+        broadcast_rate_limiter.slow_down(e.value)
+        await admission.throttle(e.value)
+        try:
+            await broadcast_rate_limiter.acquire()
+            await _send_parsed_message(client, user_id, parsed)
+            return True
+        except Exception:
+            return False
+    except Exception:
+        return False
 
 
 async def handle_broadcast_callback(client: Client, callback: CallbackQuery, data: str, lang_code: str):
@@ -3461,11 +4529,11 @@ async def handle_broadcast_callback(client: Client, callback: CallbackQuery, dat
         await callback.answer(get_text("errors.not_owner", lang_code=lang_code), show_alert=True)
         return
     
-    action = data.split(":")[1]
+    action = data
     
     if action == "confirm":
         # Get cached broadcast message
-        broadcast_text = await bot_state.get_cached(f"broadcast:{callback.from_user.id}")
+        broadcast_text = bot_state.get_cached(f"broadcast:{callback.from_user.id}")
         
         if not broadcast_text:
             await callback.answer("Broadcast expired", show_alert=True)
@@ -3473,58 +4541,83 @@ async def handle_broadcast_callback(client: Client, callback: CallbackQuery, dat
         
         await callback.answer(get_text("admin.broadcast_started", lang_code=lang_code))
         
-        user_ids = await db.get_all_user_ids()
-        success_count = 0
-        fail_count = 0
+        total = await db.get_broadcast_user_count()
+        counts = {"success": 0, "failed": 0}
+        progress_template = get_template("admin.broadcast_progress", lang_code)
         
         status_msg = await callback.message.edit_text(
-            get_text("admin.broadcast_progress", lang_code=lang_code, sent=0, total=len(user_ids)),
-            parse_mode=enums.ParseMode.HTML
+            progress_template.format(sent=0, total=total)
         )
         
-        for i, uid in enumerate(user_ids):
-            try:
-                await client.send_message(uid, broadcast_text, parse_mode=enums.ParseMode.HTML)
-                success_count += 1
-            except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid):
-                fail_count += 1
-            except FloodWait as e:
-                await asyncio.sleep(e.value)
+        # Parse the HTML once instead of once per recipient
+        parsed = await client.parser.parse(broadcast_text)
+        admission = AdmissionController(BROADCAST_CONCURRENCY)
+        
+        # Recipients flow from the DB pages to the senders through a bounded queue
+        recipients: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_QUEUE_SIZE)
+        
+        async def send_worker() -> None:
+            while True:
+                user_id = await recipients.get()
                 try:
-                    await client.send_message(uid, broadcast_text, parse_mode=enums.ParseMode.HTML)
-                    success_count += 1
-                except:
-                    fail_count += 1
-            except Exception:
-                fail_count += 1
-            
-            # Update progress every 50 users
-            if (i + 1) % 50 == 0:
+                    async with admission:
+                        delivered = await send_broadcast_message(client, user_id, parsed, admission)
+                    counts["success" if delivered else "failed"] += 1
+                finally:
+                    recipients.task_done()
+        
+        async def report_progress() -> None:
+            reported = 0
+            while True:
+                await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+                sent = counts["success"] + counts["failed"]
+                if sent == reported:
+                    continue  # Nothing new; editing would only raise MessageNotModified
+                reported = sent
                 try:
-                    await status_msg.edit_text(
-                        get_text(
-                            "admin.broadcast_progress",
-                            lang_code=lang_code,
-                            sent=i + 1,
-                            total=len(user_ids)
-                        ),
-                        parse_mode=enums.ParseMode.HTML
-                    )
-                except:
-                    pass
+                    await status_msg.edit_text(progress_template.format(sent=sent, total=total))
+                except (FloodWait, BadRequest):
+                    pass  # Skip this update; the next one catches up
+        
+        # Feed recipients page by page while the workers send; the next page
+        # is fetched as soon as the queue has room, not after a page is sent
+        workers = [asyncio.create_task(send_worker()) for _ in range(BROADCAST_CONCURRENCY)]
+        progress_task = asyncio.create_task(report_progress())
+        try:
+            async for user_ids in db.iter_user_ids():
+                for user_id in user_ids:
+                    await recipients.put(user_id)
+            await recipients.join()
+        finally:
+            for task in (*workers, progress_task):
+                task.cancel()
+            await asyncio.gather(*workers, progress_task, return_exceptions=True)
         
         await status_msg.edit_text(
             get_text(
                 "admin.broadcast_completed",
                 lang_code=lang_code,
-                success=success_count,
-                failed=fail_count,
-                total=len(user_ids)
-            ),
-            parse_mode=enums.ParseMode.HTML
+                success=counts["success"],
+                failed=counts["failed"],
+                total=counts["success"] + counts["failed"]
+            )
         )
 
 
+# Callback handlers keyed by the callback data prefix ("menu:main" -> "menu")
+CALLBACK_HANDLERS: Dict[str, CallbackDataHandler] = {
+    "menu": handle_menu_callback,
+    "lang": handle_language_callback,
+    "help": handle_help_callback,
+    "dl": handle_download_callback,
+    "cancel": handle_cancel_callback,
+    "setquality": handle_quality_callback,
+    "delcookie": handle_cookie_delete_callback,
+    "admin": handle_admin_callback,
+    "broadcast": handle_broadcast_callback,
+}
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # BACKGROUND TASKS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -3552,13 +4645,11 @@ async def daily_reset_task():
             
             await asyncio.sleep(seconds_until_midnight)
             
-            # Reset daily downloads for all users
-            async with db.get_connection() as conn:
-                await conn.execute("UPDATE users SET daily_downloads = 0, daily_reset = ?", 
-                                 (datetime.now().isoformat(),))
-                await conn.commit()
+            # Reset daily downloads; only counters from earlier days are
+            # touched, so an early or repeated wake-up changes nothing
+            reset_count = await db.reset_daily_downloads()
             
-            logger.info("Daily limits reset completed")
+            logger.info("Daily limits reset completed (%d users)", reset_count)
             
         except asyncio.CancelledError:
             break
@@ -3573,7 +4664,7 @@ async def daily_reset_task():
 async def global_exception_handler(client: Client, update, exception: Exception):
     """Global error handler for all updates."""
     logger.error(f"Unhandled error in update {type(update).__name__}: {exception}")
-    logger.error(traceback.format_exc())
+    logger.debug("Traceback:", exc_info=exception)
     
     # اگر خطا در پیام است، سعی کنید به کاربر اطلاع دهید
     try:
@@ -3583,8 +4674,7 @@ async def global_exception_handler(client: Client, update, exception: Exception)
             
             await client.send_message(
                 chat_id=user_id,
-                text=get_text("common.error", lang_code=lang_code),
-                parse_mode=enums.ParseMode.HTML
+                text=get_text("common.error", lang_code=lang_code)
             )
     except Exception as e:
         logger.error(f"Error sending error message to user: {e}")
@@ -3599,6 +4689,7 @@ async def main():
     
     # Initialize database
     await db.initialize()
+    await db.migrate_cookie_tokens(cookie_encryption)
     
     # Load languages
     load_all_languages()
@@ -3615,7 +4706,7 @@ async def main():
         # Start the bot
         await app.start()
         logger.info("✅ Bot started successfully!")
-        logger.info(f"👤 Bot username: @{(await app.get_me()).username}")
+        logger.info("👤 Bot username: @%s", (await app.get_me()).username)
         
         # Keep the bot running
         await asyncio.Event().wait()
@@ -3630,14 +4721,21 @@ async def main():
         daily_reset_handle.cancel()
         
         await db.close()
+        await close_http_session()
         await app.stop()
         
         logger.info("👋 Bot stopped")
+        
+        if log_listener is not None:
+            log_listener.stop()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
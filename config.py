@@ -25,7 +25,7 @@ import os
 import sys
 import logging
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Set, FrozenSet
+from typing import Optional, List, Dict, Any, Set, FrozenSet, TextIO, Union
 from dataclasses import dataclass, field
 from enum import Enum, auto
 from functools import lru_cache
@@ -248,6 +248,25 @@ DIRECT_LINK_PATTERNS: List[str] = [
     r"(?:https?://)[^\s]+\.(?:mp4|mkv|webm|avi|mov|flv|wmv|m4v|3gp)(?:\?[^\s]*)?$",
 ]
 
+# Platform detection compiled once into a single alternation.
+# Each platform becomes a named group, so one match both tests every
+# pattern (in the order above) and reports which platform matched.
+PLATFORM_REGEX: re.Pattern = re.compile(
+    "|".join(
+        f"(?P<{platform}>{'|'.join(patterns)})"
+        for platform, patterns in PLATFORM_PATTERNS.items()
+    ),
+    re.IGNORECASE
+)
+
+DIRECT_LINK_REGEX: re.Pattern = re.compile(
+    "|".join(DIRECT_LINK_PATTERNS),
+    re.IGNORECASE
+)
+
+# Cheap prefix check done before running the full URL regex
+URL_PREFIXES: tuple = ("http://", "https://")
+
 # URL validation pattern
 URL_PATTERN: re.Pattern = re.compile(
     r'^https?://'
@@ -346,6 +365,9 @@ class LoggingConfig:
 class SecurityConfig:
     """Security configuration."""
     encryption_key: Optional[str] = None
+    encryption_password: Optional[str] = None
+    encryption_salt: str = "super-downloader-bot"
+    pbkdf2_iterations: int = 100_000
     cookie_encryption: bool = True
     secure_delete: bool = True
     input_sanitization: bool = True
@@ -558,6 +580,9 @@ def load_config() -> BotConfig:
     # Load security configuration
     security_config = SecurityConfig(
         encryption_key=get_env("ENCRYPTION_KEY"),
+        encryption_password=get_env("ENCRYPTION_PASSWORD"),
+        encryption_salt=get_env("ENCRYPTION_SALT", default="super-downloader-bot"),
+        pbkdf2_iterations=get_env("PBKDF2_ITERATIONS", default=100_000, cast=int),
         cookie_encryption=get_env("COOKIE_ENCRYPTION", default=True, cast=bool),
         secure_delete=get_env("SECURE_DELETE", default=True, cast=bool),
         input_sanitization=get_env("INPUT_SANITIZATION", default=True, cast=bool),
@@ -602,10 +627,14 @@ def load_config() -> BotConfig:
 # SECTION 5: Helper Functions
 # ═══════════════════════════════════════════════════════════════════════════════
 
+@lru_cache(maxsize=4096)
 def detect_platform(url: str) -> Platform:
     """
     Detect the platform from a given URL.
     
+    Results are memoized, since the same URL is checked by the handler,
+    the info extractor and the downloader in turn.
+    
     Args:
         url: The video URL to check
         
@@ -614,15 +643,13 @@ def detect_platform(url: str) -> Platform:
     """
     url = url.lower().strip()
     
-    for platform, patterns in PLATFORM_PATTERNS.items():
-        for pattern in patterns:
-            if re.match(pattern, url, re.IGNORECASE):
-                return Platform(platform)
+    match = PLATFORM_REGEX.match(url)
+    if match:
+        return Platform(match.lastgroup)
     
     # Check for direct links
-    for pattern in DIRECT_LINK_PATTERNS:
-        if re.match(pattern, url, re.IGNORECASE):
-            return Platform.DIRECT
+    if DIRECT_LINK_REGEX.match(url):
+        return Platform.DIRECT
     
     return Platform.UNKNOWN
 
@@ -637,6 +664,8 @@ def is_valid_url(url: str) -> bool:
     Returns:
         True if valid URL, False otherwise
     """
+    if not url[:8].lower().startswith(URL_PREFIXES):
+        return False
     return bool(URL_PATTERN.match(url))
 
 
@@ -753,12 +782,20 @@ def is_owner(user_id: int, config: BotConfig) -> bool:
 # SECTION 6: YT-DLP Options Generator
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _cookiefile_option(cookie_file: Optional[Union[Path, TextIO]]) -> Optional[Union[str, TextIO]]:
+    """Map a cookie path or text stream to yt-dlp's ``cookiefile`` value."""
+    if isinstance(cookie_file, Path):
+        return str(cookie_file) if cookie_file.exists() else None
+    # yt-dlp reads Netscape-format cookies straight from a text stream
+    return cookie_file
+
+
 def get_ytdlp_options(
     config: BotConfig,
     quality: str = "auto",
     audio_only: bool = False,
     output_path: Optional[Path] = None,
-    cookie_file: Optional[Path] = None,
+    cookie_file: Optional[Union[Path, TextIO]] = None,
     progress_hook: Optional[callable] = None,
 ) -> Dict[str, Any]:
     """
@@ -769,7 +806,7 @@ def get_ytdlp_options(
         quality: Desired quality
         audio_only: Extract audio only
         output_path: Output file path
-        cookie_file: Path to cookies file
+        cookie_file: Path to cookies file, or a text stream holding them
         progress_hook: Progress callback function
         
     Returns:
@@ -812,9 +849,10 @@ def get_ytdlp_options(
     if config.download.ffmpeg_location:
         options["ffmpeg_location"] = config.download.ffmpeg_location
     
-    # Add cookie file if provided
-    if cookie_file and cookie_file.exists():
-        options["cookiefile"] = str(cookie_file)
+    # Add cookies if provided
+    cookiefile = _cookiefile_option(cookie_file)
+    if cookiefile is not None:
+        options["cookiefile"] = cookiefile
     
     # Add progress hook if provided
     if progress_hook:
@@ -833,14 +871,14 @@ def get_ytdlp_options(
 
 def get_info_extract_options(
     config: BotConfig,
-    cookie_file: Optional[Path] = None,
+    cookie_file: Optional[Union[Path, TextIO]] = None,
 ) -> Dict[str, Any]:
     """
     Generate yt-dlp options for info extraction only.
     
     Args:
         config: Bot configuration
-        cookie_file: Path to cookies file
+        cookie_file: Path to cookies file, or a text stream holding them
         
     Returns:
         Dictionary of yt-dlp options for extraction
@@ -860,8 +898,9 @@ def get_info_extract_options(
         "format": "bestvideo+bestaudio/best",
     }
     
-    if cookie_file and cookie_file.exists():
-        options["cookiefile"] = str(cookie_file)
+    cookiefile = _cookiefile_option(cookie_file)
+    if cookiefile is not None:
+        options["cookiefile"] = cookiefile
     
     if config.download.ffmpeg_location:
         options["ffmpeg_location"] = config.download.ffmpeg_location
@@ -20,7 +20,7 @@ import os
 import importlib
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Set, Callable
+from typing import Dict, Any, Optional, List, Set, Callable, Tuple
 from functools import lru_cache
 from threading import Lock
 import re
@@ -51,6 +51,12 @@ _loaded_languages: Dict[str, Dict[str, Any]] = {}
 # User language preferences (user_id -> language_code)
 _user_languages: Dict[int, str] = {}
 
+# Resolved (unformatted) templates: (lang_code, key) -> text, None if missing
+_template_cache: Dict[Tuple[str, str], Optional[str]] = {}
+
+# Callbacks run after a reload, for caches built outside this module
+_reload_hooks: List[Callable[[], None]] = []
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SECTION 2: Language Loading System
@@ -90,7 +96,7 @@ def _load_language_module(lang_code: str) -> Optional[Dict[str, Any]]:
         
         # Get the STRINGS dictionary from the module
         if hasattr(module, "STRINGS"):
-            logger.info(f"✅ Loaded language: {lang_code}")
+            logger.info("✅ Loaded language: %s", lang_code)
             return module.STRINGS
         else:
             logger.warning(f"⚠️ Language module {lang_code} has no STRINGS dictionary")
@@ -131,11 +137,34 @@ def load_all_languages() -> Dict[str, Dict[str, Any]]:
         if FALLBACK_LANGUAGE not in _loaded_languages:
             logger.error(f"❌ Fallback language '{FALLBACK_LANGUAGE}' not found!")
         
-        logger.info(f"📚 Loaded {len(_loaded_languages)} languages: {list(_loaded_languages.keys())}")
+        logger.info("📚 Loaded %d languages: %s", len(_loaded_languages), list(_loaded_languages))
         
         return _loaded_languages
 
 
+def add_reload_hook(hook: Callable[[], None]) -> Callable[[], None]:
+    """
+    Register a callback to run after languages are reloaded.
+    
+    Args:
+        hook: Callable that drops anything derived from old templates
+        
+    Returns:
+        The hook, so this can be used as a decorator
+    """
+    _reload_hooks.append(hook)
+    return hook
+
+
+def _run_reload_hooks() -> None:
+    """Run the registered reload hooks, logging (not raising) failures."""
+    for hook in _reload_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"❌ Error in language reload hook: {e}")
+
+
 def reload_language(lang_code: str) -> bool:
     """
     Reload a specific language file (useful for hot-reloading).
@@ -160,6 +189,8 @@ def reload_language(lang_code: str) -> bool:
             lang_data = _load_language_module(lang_code)
             if lang_data:
                 _loaded_languages[lang_code] = lang_data
+                _template_cache.clear()
+                _run_reload_hooks()
                 return True
             return False
             
@@ -179,8 +210,11 @@ def reload_all_languages() -> int:
     
     with _language_lock:
         _loaded_languages.clear()
+        _template_cache.clear()
         
-    return len(load_all_languages())
+    count = len(load_all_languages())
+    _run_reload_hooks()
+    return count
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -348,26 +382,17 @@ def get_text(
         else:
             lang_code = DEFAULT_LANGUAGE
     
-    # Get language dictionary
-    lang_dict = get_language(lang_code)
-    fallback_dict = get_language(FALLBACK_LANGUAGE) if lang_code != FALLBACK_LANGUAGE else None
-    
-    # Navigate to the key
-    text = _get_nested_value(lang_dict, key)
-    
-    # Fallback to English if not found
-    if text is None and fallback_dict:
-        text = _get_nested_value(fallback_dict, key)
+    text = _resolve_template(key, lang_code)
     
-    # Return key if still not found
+    # Return key if not found in the language or the fallback
     if text is None:
         logger.warning(f"⚠️ Missing translation: '{key}' for language '{lang_code}'")
         return f"[{key}]"
     
-    # Format the string if kwargs provided
+    # Format the string if kwargs provided (format_map skips re-packing kwargs)
     if kwargs:
         try:
-            text = text.format(**kwargs)
+            text = text.format_map(kwargs)
         except KeyError as e:
             logger.warning(f"⚠️ Missing format key {e} for '{key}'")
         except Exception as e:
@@ -376,6 +401,55 @@ def get_text(
     return text
 
 
+def get_template(key: str, lang_code: Optional[str] = None) -> str:
+    """
+    Get a translated string without formatting it.
+    
+    Useful where the same message is formatted many times: fetch the
+    template once and call ``format``/``format_map`` on it directly.
+    
+    Args:
+        key: Translation key (can be nested with dots)
+        lang_code: Language code (default language if omitted)
+        
+    Returns:
+        Raw template string, or "[key]" if the key is missing
+    """
+    text = _resolve_template(key, lang_code or DEFAULT_LANGUAGE)
+    if text is None:
+        logger.warning(f"⚠️ Missing translation: '{key}' for language '{lang_code}'")
+        return f"[{key}]"
+    return text
+
+
+def _resolve_template(key: str, lang_code: str) -> Optional[str]:
+    """
+    Look up a key in a language, falling back to English (memoized).
+    
+    Args:
+        key: Translation key (can be nested with dots)
+        lang_code: Language code
+        
+    Returns:
+        Raw template string, or None if neither language has it
+    """
+    cache_key = (lang_code, key)
+    try:
+        return _template_cache[cache_key]
+    except KeyError:
+        pass
+    
+    # Navigate to the key
+    text = _get_nested_value(get_language(lang_code), key)
+    
+    # Fallback to English if not found
+    if text is None and lang_code != FALLBACK_LANGUAGE:
+        text = _get_nested_value(get_language(FALLBACK_LANGUAGE), key)
+    
+    _template_cache[cache_key] = text
+    return text
+
+
 def _get_nested_value(dictionary: Dict[str, Any], key: str) -> Optional[str]:
     """
     Get a value from a nested dictionary using dot notation.
@@ -504,6 +578,7 @@ __all__ = [
     "load_all_languages",
     "reload_language",
     "reload_all_languages",
+    "add_reload_hook",
     
     # Language access
     "get_available_languages",
@@ -519,6 +594,7 @@ __all__ = [
     
     # Text retrieval
     "get_text",
+    "get_template",
     "t",
     
     # RTL support
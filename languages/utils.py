@@ -29,6 +29,10 @@ PERSIAN_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
 ARABIC_DIGITS = "٠١٢٣٤٥٦٧٨٩"
 ENGLISH_DIGITS = "0123456789"
 
+# Translation tables, so each conversion is a single str.translate pass
+_TO_PERSIAN_TABLE = str.maketrans(ENGLISH_DIGITS + ARABIC_DIGITS, PERSIAN_DIGITS * 2)
+_TO_ENGLISH_TABLE = str.maketrans(PERSIAN_DIGITS + ARABIC_DIGITS, ENGLISH_DIGITS * 2)
+
 
 def to_persian_digits(text: str) -> str:
     """
@@ -40,12 +44,7 @@ def to_persian_digits(text: str) -> str:
     Returns:
         Text with Persian digits
     """
-    result = str(text)
-    for i, digit in enumerate(ENGLISH_DIGITS):
-        result = result.replace(digit, PERSIAN_DIGITS[i])
-    for i, digit in enumerate(ARABIC_DIGITS):
-        result = result.replace(digit, PERSIAN_DIGITS[i])
-    return result
+    return str(text).translate(_TO_PERSIAN_TABLE)
 
 
 def to_english_digits(text: str) -> str:
@@ -58,12 +57,7 @@ def to_english_digits(text: str) -> str:
     Returns:
         Text with English digits
     """
-    result = str(text)
-    for i, digit in enumerate(PERSIAN_DIGITS):
-        result = result.replace(digit, ENGLISH_DIGITS[i])
-    for i, digit in enumerate(ARABIC_DIGITS):
-        result = result.replace(digit, ENGLISH_DIGITS[i])
-    return result
+    return str(text).translate(_TO_ENGLISH_TABLE)
 
 
 def format_number(